@@ -0,0 +1,52 @@
+import hashlib
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+from .models import Profile
+
+# field name -> square size in pixels of the generated avatars
+AVATAR_SIZES = {
+    "avatar_small": 40,
+    "avatar_large": 160,
+}
+
+
+def render_avatar(image, size):
+    """Crop `image` to a centered square of `size` pixels, encoded as WebP."""
+    avatar = ImageOps.fit(image, (size, size), Image.Resampling.LANCZOS)
+    buffer = BytesIO()
+    avatar.save(buffer, format="WEBP", quality=80, method=6)
+    return ContentFile(buffer.getvalue())
+
+
+def process_profile_image(profile_id, image_name):
+    """
+    Generate the avatar sizes of a profile picture. `image_name` is the
+    picture the job was queued for; the job is skipped if it has been
+    replaced in the meantime.
+    """
+    profile = Profile.objects.filter(pk=profile_id).first()
+    if profile is None or profile.image.name != image_name:
+        return
+
+    old_names = [getattr(profile, field_name).name for field_name in AVATAR_SIZES]
+    with profile.image.open("rb") as file:
+        image = ImageOps.exif_transpose(Image.open(file))
+        image = image.convert("RGBA" if image.mode in ("RGBA", "LA", "P") else "RGB")
+
+        for field_name, size in AVATAR_SIZES.items():
+            avatar = render_avatar(image, size)
+            # a content hash in the name, so cached pages keep their image
+            digest = hashlib.sha256(avatar.read()).hexdigest()[:12]
+            getattr(profile, field_name).save(
+                f"{profile.user_id}_{size}_{digest}.webp", avatar, save=False
+            )
+
+    # `updated` changes the version of cached post cards showing the avatar
+    profile.save(update_fields=[*AVATAR_SIZES, "updated"])
+    # only once the profile points at the new files
+    for name in old_names:
+        if name:
+            profile.image.storage.delete(name)
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from accounts.images import process_profile_image
+from accounts.models import Profile
+
+
+class Command(BaseCommand):
+    help = "Generate the avatar sizes of profile pictures that don't have them yet."
+
+    def handle(self, *args, **options):
+        default_image = Profile._meta.get_field("image").default
+        profiles = (
+            Profile.objects.exclude(image=default_image)
+            .filter(avatar_small="")
+            .values_list("pk", "image")
+        )
+        total = 0
+        for profile_id, image_name in profiles.iterator():
+            try:
+                process_profile_image(profile_id, image_name)
+            except OSError as exc:
+                self.stderr.write(f"Skipping profile {profile_id}: {exc}")
+                continue
+            total += 1
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Generated avatars for {total} profiles.")
+        )
@@ -0,0 +1,59 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from accounts.models import Profile
+
+
+class Command(BaseCommand):
+    help = "Rebuild the denormalized followers_count and following_count of profiles."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of profiles updated per statement (default: 1000).",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        Follow = Profile.follows.through
+
+        followers = (
+            Follow.objects.filter(to_profile_id=OuterRef("pk"))
+            .order_by()
+            .values("to_profile_id")
+            .annotate(total=Count("*"))
+            .values("total")
+        )
+        following = (
+            Follow.objects.filter(from_profile_id=OuterRef("pk"))
+            .order_by()
+            .values("from_profile_id")
+            .annotate(total=Count("*"))
+            .values("total")
+        )
+
+        ids = Profile.objects.order_by("pk").values_list("pk", flat=True)
+        last_pk = 0
+        updated = 0
+        while True:
+            batch = list(ids.filter(pk__gt=last_pk)[:batch_size])
+            if not batch:
+                break
+            updated += Profile.objects.filter(
+                pk__gte=batch[0], pk__lte=batch[-1]
+            ).update(
+                followers_count=Coalesce(
+                    Subquery(followers, output_field=IntegerField()), 0
+                ),
+                following_count=Coalesce(
+                    Subquery(following, output_field=IntegerField()), 0
+                ),
+            )
+            last_pk = batch[-1]
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Reconciled follow counts of {updated} profiles.")
+        )
@@ -2,11 +2,15 @@ from django.conf import settings
 from django.contrib.auth.models import AbstractUser
 from django.core.exceptions import ValidationError
 from django.db import models
+from django.db.models import F
+from django.db.models.functions import Greatest
 from django.urls import reverse
-from PIL import Image
 
+from config.db import LoadedValuesMixin
+from config.tasks import enqueue
 
-class CustomUser(AbstractUser):
+
+class CustomUser(LoadedValuesMixin, AbstractUser):
     email = models.EmailField(unique=True)
     headline = models.CharField(
         max_length=255,
@@ -35,8 +39,21 @@ class CustomUser(AbstractUser):
         else:
             return self.username
 
+    def display_name_changed(self):
+        """
+        Whether the name or username shown for the user changed since it was
+        loaded. get_full_name() also depends on last_login being set.
+        """
+        if self.get_loaded_value("username") is None:
+            # new, or loaded without the fields
+            return False
+        return any(
+            self.get_loaded_value(field) != getattr(self, field)
+            for field in ("first_name", "last_name", "username")
+        ) or bool(self.get_loaded_value("last_login")) != bool(self.last_login)
+
 
-class Profile(models.Model):
+class Profile(LoadedValuesMixin, models.Model):
     """Model to represent user profile"""
 
     user = models.OneToOneField(
@@ -47,12 +64,23 @@ class Profile(models.Model):
     image = models.ImageField(
         default="default_profile.jpg", upload_to="Profile Pictures/"
     )
+    # fixed-size WebP versions of `image`, generated by accounts.images
+    avatar_small = models.ImageField(
+        upload_to="Profile Pictures/avatars/", blank=True, editable=False
+    )
+    avatar_large = models.ImageField(
+        upload_to="Profile Pictures/avatars/", blank=True, editable=False
+    )
     follows = models.ManyToManyField(
         "self",
         related_name="followers",
         symmetrical=False,
         blank=True,
     )
+    updated = models.DateTimeField(auto_now=True)
+    # denormalized counters, kept in sync by accounts.signals
+    followers_count = models.PositiveIntegerField(default=0, editable=False)
+    following_count = models.PositiveIntegerField(default=0, editable=False)
 
     def __str__(self) -> str:
         return f"{self.user.email} Profile"
@@ -62,14 +90,15 @@ class Profile(models.Model):
     #     if self.follows.filter(pk=self.pk).exists():
     #         raise ValidationError("User cannot follow themselves.")
 
-    def save(self, *args, **kwargs):
-        super().save(*args, **kwargs)
+    @property
+    def avatar_small_url(self):
+        """URL of the 40px avatar, or of the original picture until it exists."""
+        return (self.avatar_small or self.image).url
 
-        img = Image.open(self.image.path)
-        if img.height > 300 or img.width > 300:
-            output_size = (300, 50)
-            img.thumbnail(output_size)
-            img.save(self.image.path)
+    @property
+    def avatar_large_url(self):
+        """URL of the 160px avatar, or of the original picture until it exists."""
+        return (self.avatar_large or self.image).url
 
     def get_followers(self):
         """Retrieve all followers"""
@@ -79,8 +108,59 @@ class Profile(models.Model):
         """Retrieve all followings"""
         return self.follows.all()
 
+    def get_followings_preview(self):
+        """Retrieve the most recently followed profiles, for the sidebar."""
+        follows = (
+            Profile.follows.through.objects.filter(from_profile_id=self.pk)
+            .select_related("to_profile__user")
+            .order_by("-id")[: settings.FOLLOWING_PREVIEW_SIZE]
+        )
+        return [follow.to_profile for follow in follows]
+
     def get_followers_count(self):
-        return self.followers.count()
+        return self.followers_count
 
     def get_followings_count(self):
-        return self.follows.count()
+        return self.following_count
+
+    def is_following(self, profile):
+        return Profile.follows.through.objects.filter(
+            from_profile_id=self.pk, to_profile_id=profile.pk
+        ).exists()
+
+    def follow(self, profile):
+        """
+        Follow `profile`. Following twice, even concurrently, keeps a single
+        row. Returns True if a follow was added.
+        """
+        if profile.pk == self.pk:
+            return False
+        _, created = Profile.follows.through.objects.get_or_create(
+            from_profile_id=self.pk, to_profile_id=profile.pk
+        )
+        if created:
+            from blogs.timeline import add_author_to_timeline  # imports this module
+
+            self._adjust_follow_counts(profile, 1)
+            enqueue(add_author_to_timeline, self.pk, profile.pk)
+        return created
+
+    def unfollow(self, profile):
+        """Stop following `profile`. Returns True if a follow was removed."""
+        deleted, _ = Profile.follows.through.objects.filter(
+            from_profile_id=self.pk, to_profile_id=profile.pk
+        ).delete()
+        if deleted:
+            from blogs.timeline import remove_author_from_timeline
+
+            self._adjust_follow_counts(profile, -deleted)
+            enqueue(remove_author_from_timeline, self.pk, profile.pk)
+        return bool(deleted)
+
+    def _adjust_follow_counts(self, profile, delta):
+        Profile.objects.filter(pk=self.pk).update(
+            following_count=Greatest(F("following_count") + delta, 0)
+        )
+        Profile.objects.filter(pk=profile.pk).update(
+            followers_count=Greatest(F("followers_count") + delta, 0)
+        )
@@ -1,10 +1,18 @@
 from django.contrib.auth import get_user_model
-from django.db.models.signals import post_save
+from django.db.models.signals import m2m_changed, post_save
 from django.dispatch import receiver
+from django.utils import timezone
 
+from blogs.models import TimelineEntry
+from blogs.timeline import add_author_to_timeline, remove_author_from_timeline
+from config.db import adjust_counter
+from config.tasks import enqueue
+
+from .images import process_profile_image
 from .models import Profile
 
 User = get_user_model()
+Follow = Profile.follows.through
 
 
 @receiver(post_save, sender=User)
@@ -14,5 +22,85 @@ def create_profile(sender, instance, created, **kwargs):
 
 
 @receiver(post_save, sender=User)
-def save_profile(sender, instance, **kwargs):
-    instance.profile.save()
+def save_profile(sender, instance, created, raw=False, **kwargs):
+    """
+    Mark the profile as updated when the name shown on the user's post cards
+    changes, without re-saving a possibly stale profile instance over the
+    avatars written by the background image job. Other saves, such as the
+    last_login update on every login, keep the cached cards.
+    """
+    if not created and not raw and instance.display_name_changed():
+        Profile.objects.filter(user=instance).update(updated=timezone.now())
+
+
+@receiver(post_save, sender=Profile)
+def queue_profile_image_processing(sender, instance, created, raw=False, **kwargs):
+    """Generate the avatar sizes in the background when the picture changes."""
+    if raw or instance.image.name == instance.get_loaded_value("image"):
+        return
+    if created and instance.image.name == Profile._meta.get_field("image").default:
+        return
+    enqueue(process_profile_image, instance.pk, instance.image.name)
+
+
+@receiver(m2m_changed, sender=Follow)
+def update_follow_counts(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Keep followers_count and following_count in sync for changes made
+    through the follows relation (e.g. the admin). `reverse` is True for
+    changes made from the followed side (profile.followers.add(...)).
+    """
+    if reverse:
+        own_field, other_field = "followers_count", "following_count"
+        lookup, pk_field = {"to_profile_id": instance.pk}, "from_profile_id"
+    else:
+        own_field, other_field = "following_count", "followers_count"
+        lookup, pk_field = {"from_profile_id": instance.pk}, "to_profile_id"
+
+    if action in ("pre_remove", "pre_clear"):
+        # capture the rows that actually exist before they are deleted
+        existing = sender.objects.filter(**lookup)
+        if action == "pre_remove":
+            existing = existing.filter(**{f"{pk_field}__in": pk_set})
+        instance._removed_follow_ids = set(existing.values_list(pk_field, flat=True))
+        return
+
+    if action == "post_add":
+        changed, delta = pk_set, 1
+    elif action in ("post_remove", "post_clear"):
+        changed, delta = instance.__dict__.pop("_removed_follow_ids", set()), -1
+    else:
+        return
+
+    if changed:
+        adjust_counter(
+            Profile.objects.filter(pk=instance.pk), own_field, delta * len(changed)
+        )
+        adjust_counter(Profile.objects.filter(pk__in=changed), other_field, delta)
+
+
+@receiver(m2m_changed, sender=Follow)
+def update_timeline_on_follows_change(
+    sender, instance, action, reverse, pk_set, **kwargs
+):
+    """
+    Add or remove the followed authors' posts in timelines for changes made
+    through the follows relation; Profile.follow() and unfollow() do it
+    themselves.
+    """
+    if action == "post_clear":
+        if reverse:
+            TimelineEntry.objects.filter(post__author=instance.user_id).delete()
+        else:
+            TimelineEntry.objects.filter(user=instance.user_id).delete()
+        return
+
+    if action == "post_add":
+        task = add_author_to_timeline
+    elif action == "post_remove":
+        task = remove_author_from_timeline
+    else:
+        return
+    for pk in pk_set:
+        follower_id, author_id = (pk, instance.pk) if reverse else (instance.pk, pk)
+        enqueue(task, follower_id, author_id)
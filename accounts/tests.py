@@ -1,3 +1,93 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
 from django.test import TestCase
+from django.urls import reverse
+
+from .models import Profile
+
+User = get_user_model()
+
+
+class ProfileUpdatedTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            "alice", email="alice@example.com", password="password"
+        )
+        self.client.login(email="alice@example.com", password="password")
+
+    def get_updated(self):
+        return Profile.objects.get(user=self.user).updated
+
+    def test_login_keeps_profile_updated(self):
+        updated = self.get_updated()
+        self.client.logout()
+        self.client.login(email="alice@example.com", password="password")
+        self.assertEqual(self.get_updated(), updated)
+
+    def test_name_change_bumps_profile_updated(self):
+        updated = self.get_updated()
+        user = User.objects.get(pk=self.user.pk)
+        user.first_name = "Alice"
+        user.save()
+        self.assertGreater(self.get_updated(), updated)
+
+
+class FollowTests(TestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user("alice", email="alice@example.com")
+        self.bob = User.objects.create_user("bob", email="bob@example.com")
+
+    def get_counts(self, user):
+        profile = Profile.objects.get(user=user)
+        return profile.followers_count, profile.following_count
+
+    def test_follow_and_unfollow_are_idempotent(self):
+        alice, bob = self.alice.profile, self.bob.profile
+        self.assertIs(alice.follow(bob), True)
+        self.assertIs(alice.follow(bob), False)
+        self.assertEqual(self.get_counts(self.alice), (0, 1))
+        self.assertEqual(self.get_counts(self.bob), (1, 0))
+        self.assertIs(alice.unfollow(bob), True)
+        self.assertIs(alice.unfollow(bob), False)
+        self.assertEqual(self.get_counts(self.alice), (0, 0))
+        self.assertEqual(self.get_counts(self.bob), (0, 0))
+
+    def test_relation_changes_keep_the_counts(self):
+        alice, bob = self.alice.profile, self.bob.profile
+        alice.follows.add(bob)
+        alice.follows.add(bob)
+        bob.followers.add(alice)
+        self.assertEqual(self.get_counts(self.bob), (1, 0))
+        bob.followers.remove(alice)
+        alice.follows.remove(bob)
+        self.assertEqual(self.get_counts(self.alice), (0, 0))
+        self.assertEqual(self.get_counts(self.bob), (0, 0))
+
+    def test_self_follow(self):
+        self.assertIs(self.alice.profile.follow(self.alice.profile), False)
+        self.assertEqual(self.get_counts(self.alice), (0, 0))
+
+    def test_toggle(self):
+        self.client.force_login(self.alice)
+        url = reverse("users:follow-toggle", args=[self.bob.pk])
+        response = self.client.post(url, secure=True).json()
+        self.assertEqual(
+            (response["is_following"], response["followers_count"]), (True, 1)
+        )
+        response = self.client.post(url, secure=True).json()
+        self.assertEqual(
+            (response["is_following"], response["followers_count"]), (False, 0)
+        )
+        response = self.client.post(
+            reverse("users:follow-toggle", args=[self.alice.pk]), secure=True
+        )
+        self.assertIs(response.json()["success"], False)
 
-# Create your tests here.
+    def test_reconcile_follow_counts(self):
+        self.alice.profile.follow(self.bob.profile)
+        Profile.objects.update(followers_count=5, following_count=5)
+        call_command("reconcile_follow_counts", stdout=StringIO())
+        self.assertEqual(self.get_counts(self.alice), (0, 1))
+        self.assertEqual(self.get_counts(self.bob), (1, 0))
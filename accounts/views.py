@@ -1,11 +1,13 @@
+import asyncio
+
 from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth import get_user_model
 from django.contrib.auth import views as auth_views
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.core.mail import send_mail
-from django.core.paginator import Paginator
-from django.http import HttpResponseRedirect, JsonResponse
+from django.db.models import Exists, OuterRef
+from django.http import Http404, HttpResponseRedirect, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse, reverse_lazy
 from django.views import generic
@@ -13,7 +15,10 @@ from django.views.generic import FormView
 from django.views.generic.detail import DetailView
 from django.views.generic.list import ListView
 
+from blogs.dashboard import get_dashboard_stats
 from blogs.models import Post, Comment
+from blogs.pagination import CursorPaginationMixin
+from config.concurrency import load_user, run_in_thread
 
 from .forms import (
     ContactForm,
@@ -24,6 +29,12 @@ from .forms import (
 from .models import Profile
 
 User = get_user_model()
+Follow = Profile.follows.through
+
+
+def is_following(user, profile):
+    """Whether the (possibly anonymous) `user` follows `profile`."""
+    return user.is_authenticated and user.profile.is_following(profile)
 
 
 class CustomLoginView(auth_views.LoginView):
@@ -103,14 +114,42 @@ class CustomPasswordResetCompleteView(auth_views.PasswordResetCompleteView):
     template_name = "accounts/registration/password_reset_complete.html"
 
 
-class ProfileView(DetailView):
+class ProfileView(CursorPaginationMixin, DetailView):
     model = User
     context_object_name = "user"
     template_name = "accounts/profile.html"
+    paginate_by = 10
 
-    def get_object(self):
+    async def aget_object(self):
         username = self.kwargs.get("username")
-        return get_object_or_404(User, username=username)
+        try:
+            return await User.objects.select_related("profile").aget(username=username)
+        except User.DoesNotExist:
+            raise Http404("No user found matching the query")
+
+    async def get(self, request, *args, **kwargs):
+        await load_user(request)
+        self.object = user = await self.aget_object()
+        posts = (
+            Post.published.filter(author=user)
+            .select_related("author", "author__profile")
+            .defer("content")
+        )
+        page = self.aget_cursor_page(posts, self.paginate_by)
+        self.following_preview = self.is_following = None
+        if request.htmx:
+            # the infinite scroll partial only renders the posts
+            self.page_obj = await page
+        else:
+            profile = user.profile
+            self.page_obj, self.following_preview, self.is_following = (
+                await asyncio.gather(
+                    page,
+                    run_in_thread(profile.get_followings_preview),
+                    run_in_thread(is_following, request.user, profile),
+                )
+            )
+        return self.render_to_response(self.get_context_data(object=user))
 
     def get_template_names(self):
         if self.request.htmx:
@@ -119,22 +158,16 @@ class ProfileView(DetailView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        user = self.object
-        posts = Post.published.filter(author=user).select_related(
-            "author", "author__profile"
-        )
-        paginator = Paginator(posts, per_page=10)
-        page_number = self.request.GET.get("page")
-        page_obj = paginator.get_page(page_number)
-
-        profile = get_object_or_404(Profile, user=user)
+        profile = self.object.profile
 
-        context["page_obj"] = page_obj
-        context["posts"] = page_obj.object_list
+        context["page_obj"] = self.page_obj
+        context["posts"] = self.page_obj.object_list
         context["profile"] = profile
         context["username"] = self.kwargs.get("username")
         context["followers_count"] = profile.get_followers_count()
-        context["followings"] = profile.get_followings()
+        context["following_count"] = profile.get_followings_count()
+        context["following_preview"] = self.following_preview
+        context["is_following"] = self.is_following
         context["page"] = "profile"
         return context
 
@@ -154,6 +187,7 @@ class UserAboutView(generic.TemplateView):
         context["profile"] = user.profile
         context["followers_count"] = followers_count
         context["following_count"] = following_count
+        context["is_following"] = is_following(self.request.user, user.profile)
         context["page"] = "user_about"
         return context
 
@@ -189,10 +223,11 @@ class ProfileEditView(LoginRequiredMixin, generic.View):
         return render(request, "accounts/profile_edit.html", context)
 
 
-class DashboardView(LoginRequiredMixin, ListView):
+class DashboardView(LoginRequiredMixin, CursorPaginationMixin, ListView):
     """Display the user dashboard and handles sorting and filtering."""
 
     model = Post
+    paginate_by = 20
     context_object_name = "posts"
     template_name = "accounts/dashboard.html"
 
@@ -202,32 +237,40 @@ class DashboardView(LoginRequiredMixin, ListView):
             "content", "overview", "thumbnail"
         )
 
-        # sorting params
-        sort = self.request.GET.get("sort", "newest")
-        if sort == "oldest":
-            queryset = queryset.order_by("publish")
-        elif sort == "newest":
-            queryset = queryset.order_by("-publish")
-
-        # filtering params
+        # filtering params, an exact match so the status index is used
         status = self.request.GET.get("status", "all")
-        if status != "all":
-            queryset = queryset.filter(status__iexact=status)
+        if status in Post.Status.values:
+            queryset = queryset.filter(status=status)
 
         return queryset
 
+    def get_cursor_ordering(self):
+        # sorting params
+        if self.request.GET.get("sort") == "oldest":
+            return ("publish", "id")
+        return ("-publish", "-id")
+
+    def get_template_names(self):
+        if self.request.htmx:
+            return "accounts/partials/dashboard_posts_page.html"
+        return self.template_name
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        user = self.request.user
-        context["total_posts"] = Post.objects.filter(author=user).count()
+        if not self.request.htmx:
+            stats = get_dashboard_stats(self.request.user.pk)
+            context["stats"] = stats
+            context["total_posts"] = stats["total_posts"]
         context["page"] = "dashboard"
         return context
 
 
-class UserCommentsListView(LoginRequiredMixin, ListView):
+class UserCommentsListView(LoginRequiredMixin, CursorPaginationMixin, ListView):
     """Display a list of comments commented by the currently logged-in user."""
 
     model = Comment
+    paginate_by = 20
+    cursor_ordering = ("-created", "-id")
     context_object_name = "comments"
     template_name = "accounts/user_comments.html"
 
@@ -237,6 +280,11 @@ class UserCommentsListView(LoginRequiredMixin, ListView):
         )
         return queryset
 
+    def get_template_names(self):
+        if self.request.htmx:
+            return "accounts/partials/user_comments_page.html"
+        return self.template_name
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         user = self.request.user
@@ -245,19 +293,30 @@ class UserCommentsListView(LoginRequiredMixin, ListView):
         return context
 
 
-class UserPostLikesListView(LoginRequiredMixin, ListView):
+class UserPostLikesListView(LoginRequiredMixin, CursorPaginationMixin, ListView):
     """Display a list of posts liked by the currently logged-in user."""
 
-    model = Post
-    context_object_name = "likes"
+    paginate_by = 20
+    # most recently liked first
+    cursor_ordering = ("-id",)
     template_name = "accounts/user_likes.html"
 
     def get_queryset(self):
-        return Post.objects.filter(likes=self.request.user).select_related("author")
+        return (
+            Post.likes.through.objects.filter(customuser=self.request.user)
+            .select_related("post__author")
+            .defer("post__content")
+        )
+
+    def get_template_names(self):
+        if self.request.htmx:
+            return "accounts/partials/user_likes_page.html"
+        return self.template_name
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         user = self.request.user
+        context["likes"] = [like.post for like in context["object_list"]]
         context["user"] = user.get_full_name()
         context["page"] = "user_post_likes"
         return context
@@ -282,18 +341,28 @@ class FollowToggleView(generic.View):
             redirect_url = f"{login_url}?next={profile_url}"
             return HttpResponseRedirect(redirect_url)
 
-        user_to_follow = get_object_or_404(Profile, user_id=pk)
+        user_to_follow = get_object_or_404(
+            Profile.objects.select_related("user"), user_id=pk
+        )
         user_profile = request.user.profile
         is_following = False
 
-        if user_to_follow in user_profile.get_followings():
-            user_profile.follows.remove(user_to_follow)
+        if user_profile.is_following(user_to_follow):
+            user_profile.unfollow(user_to_follow)
             message = f"You have unfollowed {user_to_follow.user.get_full_name()}."
         else:
-            user_profile.follows.add(user_to_follow)
+            # follow() also returns False if a concurrent request followed first
+            if (
+                not user_profile.follow(user_to_follow)
+                and user_to_follow == user_profile
+            ):
+                return JsonResponse(
+                    {"success": False, "message": "You cannot follow yourself."}
+                )
             is_following = True
             message = f"You are now following {user_to_follow.user.get_full_name()}."
 
+        user_to_follow.refresh_from_db(fields=["followers_count"])
         response_data = {
             "success": True,
             "is_following": is_following,
@@ -303,30 +372,67 @@ class FollowToggleView(generic.View):
         return JsonResponse(response_data)
 
 
-class ProfileBaseView(ListView):
-    model = Profile
+class ProfileBaseView(CursorPaginationMixin, ListView):
+    """
+    Cursor-paginated list of the follows of a profile, most recent first.
+    Subclasses set `profile_field`, the side of the follow the profile is
+    on, and `listed_field`, the side listed.
+    """
+
+    paginate_by = 20
+    cursor_ordering = ("-id",)
+    profile_field = None
+    listed_field = None
 
     def get_profile(self):
-        username = self.kwargs.get("username")
-        return get_object_or_404(Profile, user__username=username)
+        if not hasattr(self, "_profile"):
+            self._profile = get_object_or_404(
+                Profile.objects.select_related("user"),
+                user__username=self.kwargs.get("username"),
+            )
+        return self._profile
+
+    def get_queryset(self):
+        follows = Follow.objects.filter(
+            **{self.profile_field: self.get_profile()}
+        ).select_related(f"{self.listed_field}__user")
+        if self.request.user.is_authenticated:
+            # whether the reader follows each listed profile
+            own_follows = Follow.objects.filter(
+                from_profile__user=self.request.user,
+                to_profile=OuterRef(f"{self.listed_field}_id"),
+            )
+            follows = follows.annotate(is_followed=Exists(own_follows))
+        return follows
+
+    def get_template_names(self):
+        if self.request.htmx:
+            return "accounts/partials/user_follow_list_page.html"
+        return self.template_name
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
+        profiles = []
+        for follow in context["object_list"]:
+            profile = getattr(follow, self.listed_field)
+            profile.is_followed = getattr(follow, "is_followed", False)
+            profiles.append(profile)
+        context["profiles"] = profiles
+
         profile = self.get_profile()
         context["profile"] = profile
         context["followers_count"] = profile.get_followers_count()
         context["following_count"] = profile.get_followings_count()
+        context["is_following"] = is_following(self.request.user, profile)
         return context
 
 
 class FollowingListView(ProfileBaseView):
     """Displays the list of profiles followed by a user."""
 
-    context_object_name = "followings"
     template_name = "accounts/profile_follow_list.html"
-
-    def get_queryset(self):
-        return self.get_profile().get_followings()
+    profile_field = "from_profile"
+    listed_field = "to_profile"
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -335,13 +441,11 @@ class FollowingListView(ProfileBaseView):
 
 
 class FollowersListView(ProfileBaseView):
-    """isplays the list of followers of a user."""
+    """Displays the list of followers of a user."""
 
-    context_object_name = "followers"
     template_name = "accounts/profile_follow_list.html"
-
-    def get_queryset(self):
-        return self.get_profile().get_followers()
+    profile_field = "to_profile"
+    listed_field = "from_profile"
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
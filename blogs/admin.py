@@ -14,7 +14,7 @@ class PostAdmin(admin.ModelAdmin):
     raw_id_fields = ["author"]
     date_hierarchy = "publish"
     ordering = ["status", "-publish"]
-    readonly_fields = ("publish", "updated")
+    readonly_fields = ("publish", "updated", "likes_count", "comments_count")
 
     def get_queryset(self, request):
         return super().get_queryset(request).prefetch_related("tags")
@@ -0,0 +1,49 @@
+"""
+Cached statistics for the author dashboard.
+
+The number of posts by status and the likes and comments they received
+are computed with one aggregate query over the author's posts, summing
+the Post.likes_count and Post.comments_count counters. The result is
+cached per author and dropped by blogs.signals (and Post.like/unlike)
+whenever a post, comment or like of the author changes.
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import Coalesce
+
+from .models import Post
+
+
+def get_dashboard_stats_key(author_id):
+    return f"blogs:dashboard_stats:{author_id}"
+
+
+def build_dashboard_stats(author_id):
+    return Post.objects.filter(author_id=author_id).aggregate(
+        total_posts=Count("id"),
+        published_posts=Count("id", filter=Q(status=Post.Status.PUBLISHED)),
+        draft_posts=Count("id", filter=Q(status=Post.Status.DRAFT)),
+        likes_received=Coalesce(Sum("likes_count"), 0),
+        comments_received=Coalesce(Sum("comments_count"), 0),
+    )
+
+
+def get_dashboard_stats(author_id):
+    key = get_dashboard_stats_key(author_id)
+    stats = cache.get(key)
+    if stats is None:
+        stats = build_dashboard_stats(author_id)
+        cache.set(key, stats, settings.DASHBOARD_STATS_TIMEOUT)
+    return stats
+
+
+def invalidate_dashboard_stats(*author_ids):
+    cache.delete_many([get_dashboard_stats_key(pk) for pk in author_ids])
+
+
+def invalidate_dashboard_stats_of_posts(post_ids):
+    """Drop the dashboard stats of the authors of `post_ids`."""
+    authors = Post.objects.filter(pk__in=post_ids).values_list("author_id", flat=True)
+    invalidate_dashboard_stats(*authors.distinct())
@@ -1,24 +1,104 @@
+import hashlib
+
+from asgiref.sync import markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
 from django.contrib.syndication.views import Feed
-from django.template.defaultfilters import truncatewords
-from django.urls import reverse_lazy
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse, reverse_lazy
+from django.utils.cache import get_conditional_response
 from django.utils.feedgenerator import Atom1Feed
+from django.utils.http import parse_http_date, quote_etag
+from taggit.models import Tag
 
 from .models import Post
 
+User = get_user_model()
+
+FEED_GENERATION_KEY = "feeds:generation"
+
+
+def invalidate_feeds():
+    """Drop every cached feed, by moving to a new cache generation."""
+    cache.add(FEED_GENERATION_KEY, 1, None)
+    try:
+        cache.incr(FEED_GENERATION_KEY)
+    except ValueError:
+        # evicted between add() and incr()
+        cache.set(FEED_GENERATION_KEY, 1, None)
+
+
+class CachedFeedMixin:
+    """
+    Cache the rendered feed and answer conditional requests (If-None-Match,
+    If-Modified-Since) with 304 Not Modified. Last-Modified is the newest
+    `updated` timestamp of the feed items.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # served as an async view
+        markcoroutinefunction(self)
+
+    def get_cache_key(self, generation, **kwargs):
+        scope = ":".join(f"{key}={value}" for key, value in sorted(kwargs.items()))
+        return f"feed:{generation}:{type(self).__name__}:{scope}"
 
-class PostsFeeds(Feed):
+    async def __call__(self, request, *args, **kwargs):
+        generation = await cache.aget_or_set(FEED_GENERATION_KEY, 1, None)
+        key = self.get_cache_key(generation, **kwargs)
+        cached = await cache.aget(key)
+        if cached is None:
+            # the syndication framework is sync
+            response = await sync_to_async(super().__call__)(request, *args, **kwargs)
+            cached = {
+                "content": response.content,
+                "content_type": response["Content-Type"],
+                "last_modified": response.get("Last-Modified"),
+                "etag": quote_etag(hashlib.md5(response.content).hexdigest()),
+            }
+            await cache.aset(key, cached, settings.FEED_CACHE_TIMEOUT)
+
+        last_modified = cached["last_modified"]
+        response = get_conditional_response(
+            request,
+            etag=cached["etag"],
+            last_modified=last_modified and parse_http_date(last_modified),
+        )
+        if response is None:
+            response = HttpResponse(
+                cached["content"], content_type=cached["content_type"]
+            )
+        response["ETag"] = cached["etag"]
+        if last_modified:
+            response["Last-Modified"] = last_modified
+        return response
+
+
+class PostsFeeds(CachedFeedMixin, Feed):
     title = "My post"
     link = reverse_lazy("blogs:index")
     description = "New posts of MyBlog."
 
-    def items(self):
-        return Post.published.all()[:5]
+    def get_queryset(self, obj):
+        return Post.published.select_related("author").defer("content")
+
+    def items(self, obj):
+        return self.get_queryset(obj)[:5]
 
     def item_title(self, item):
         return item.title
 
     def item_description(self, item):
-        return truncatewords(item.content, 30)
+        return item.overview or item.excerpt
+
+    def item_pubdate(self, item):
+        return item.publish
+
+    def item_updateddate(self, item):
+        return item.updated
 
     def item_lastupdated(self, item):
         return item.updated
@@ -27,3 +107,41 @@ class PostsFeeds(Feed):
 class AtomSiteNewsFeed(PostsFeeds):
     feed_type = Atom1Feed
     subtitle = PostsFeeds.description
+
+
+class AuthorPostsFeed(PostsFeeds):
+    """Latest posts of a single author."""
+
+    def get_object(self, request, username):
+        return get_object_or_404(User, username=username)
+
+    def title(self, obj):
+        return f"Posts by {obj.get_full_name()}"
+
+    def link(self, obj):
+        return obj.get_absolute_url()
+
+    def description(self, obj):
+        return f"New posts of {obj.get_full_name()} on MyBlog."
+
+    def get_queryset(self, obj):
+        return super().get_queryset(obj).filter(author=obj)
+
+
+class TagPostsFeed(PostsFeeds):
+    """Latest posts with a given tag."""
+
+    def get_object(self, request, tag_slug):
+        return get_object_or_404(Tag, slug=tag_slug)
+
+    def title(self, obj):
+        return f"Posts tagged {obj.name}"
+
+    def link(self, obj):
+        return reverse("blogs:tag_list", args=[obj.slug])
+
+    def description(self, obj):
+        return f"New posts tagged {obj.name} on MyBlog."
+
+    def get_queryset(self, obj):
+        return super().get_queryset(obj).filter(tags__slug=obj.slug)
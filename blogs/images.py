@@ -0,0 +1,100 @@
+import base64
+import hashlib
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageFilter, ImageOps
+
+from .models import Post
+
+# widths in pixels of the generated thumbnail variants
+THUMBNAIL_WIDTHS = (480, 960, 1600)
+# width in pixels of the blurred placeholder inlined in the page
+PLACEHOLDER_WIDTH = 16
+
+
+def get_digest(data):
+    """Short content hash to version the generated file names."""
+    return hashlib.sha256(data).hexdigest()[:12]
+
+
+def encode_webp(image, quality):
+    buffer = BytesIO()
+    image.save(buffer, format="WEBP", quality=quality, method=6)
+    return buffer.getvalue()
+
+
+def render_thumbnail_variants(data):
+    """
+    Render the resized variants and the placeholder of an uploaded image.
+
+    Takes and returns plain bytes/strings only, so it can run in a separate
+    process. Returns a list of (width, height, webp_bytes), narrowest first,
+    and a data URI of the blurred placeholder. Images are never upscaled.
+    """
+    image = ImageOps.exif_transpose(Image.open(BytesIO(data)))
+    image = image.convert("RGBA" if image.mode in ("RGBA", "LA", "P") else "RGB")
+
+    widths = [width for width in THUMBNAIL_WIDTHS if width < image.width]
+    if len(widths) < len(THUMBNAIL_WIDTHS):
+        # the image is narrower than the widest variant, keep its own width
+        widths.append(image.width)
+
+    variants = []
+    for width in widths:
+        height = round(image.height * width / image.width)
+        resized = image.resize((width, height), Image.Resampling.LANCZOS)
+        variants.append((width, height, encode_webp(resized, quality=80)))
+
+    height = max(round(image.height * PLACEHOLDER_WIDTH / image.width), 1)
+    placeholder = image.resize((PLACEHOLDER_WIDTH, height)).filter(
+        ImageFilter.GaussianBlur(1)
+    )
+    encoded = base64.b64encode(encode_webp(placeholder, quality=30)).decode()
+    return variants, f"data:image/webp;base64,{encoded}"
+
+
+def delete_thumbnail_variants(variants):
+    for variant in variants:
+        default_storage.delete(variant["name"])
+
+
+def save_thumbnail_variants(post, variants, placeholder):
+    """
+    Store rendered variants and record them on the post. The file names
+    carry a hash of the content, so a cached page never points at a newer
+    image under an old name, and the old files are only deleted once the
+    new ones are recorded.
+    """
+    stored = [
+        {
+            "width": width,
+            "height": height,
+            "name": default_storage.save(
+                f"post_images/variants/{post.pk}_{width}_{get_digest(data)}.webp",
+                ContentFile(data),
+            ),
+        }
+        for width, height, data in variants
+    ]
+    # a queryset update, so the post isn't reindexed or marked as edited
+    Post.objects.filter(pk=post.pk).update(
+        thumbnail_variants=stored, thumbnail_placeholder=placeholder
+    )
+    delete_thumbnail_variants(post.thumbnail_variants)
+
+
+def process_post_thumbnail(post_id, thumbnail_name):
+    """
+    Generate the variants of a post thumbnail. `thumbnail_name` is the
+    upload the job was queued for; the job is skipped if it was replaced.
+    """
+    post = Post.objects.filter(pk=post_id).only("thumbnail", "thumbnail_variants")
+    post = post.first()
+    if post is None or post.thumbnail.name != thumbnail_name:
+        return
+
+    with post.thumbnail.open("rb") as file:
+        data = file.read()
+    save_thumbnail_variants(post, *render_thumbnail_variants(data))
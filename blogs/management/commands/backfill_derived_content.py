@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+
+from blogs.models import DERIVED_CONTENT_FIELDS, Post
+
+
+class Command(BaseCommand):
+    help = "Compute word count, read time and excerpt for existing posts."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=500,
+            help="Number of posts loaded and updated at a time (default: 500).",
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = options["chunk_size"]
+        queryset = Post.objects.order_by("pk").only("pk", "title", "content")
+
+        last_pk = 0
+        total = 0
+        while True:
+            posts = list(queryset.filter(pk__gt=last_pk)[:chunk_size])
+            if not posts:
+                break
+            for post in posts:
+                post.update_derived_content()
+            # bulk_update leaves the `updated` timestamp untouched
+            Post.objects.bulk_update(posts, sorted(DERIVED_CONTENT_FIELDS))
+            total += len(posts)
+            last_pk = posts[-1].pk
+            self.stdout.write(f"Processed {total} posts...")
+
+        self.stdout.write(self.style.SUCCESS(f"Backfilled {total} posts."))
@@ -0,0 +1,201 @@
+import json
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.urls import URLPattern, URLResolver, get_resolver, reverse
+
+from accounts.models import Profile
+from blogs.models import Comment, Post
+from blogs.tag_index import get_top_tags
+from config.middleware import RequestMetrics, measure
+
+User = get_user_model()
+
+# namespaces of third-party and tooling routes
+SKIPPED_NAMESPACES = {"admin", "djdt", "social"}
+# routes that change state or need a one-time token
+SKIPPED_ROUTES = {
+    "accounts:logout",
+    "accounts:password_reset_confirm",
+    "blogs:post_like",
+    "blogs:post_unlike",
+    "users:follow-toggle",
+    # editor helpers served by django-tinymce
+    "tinymce-linklist",
+    "tinymce-compressor",
+    "tinymce-filebrowser",
+}
+
+
+def get_named_routes(resolver=None, namespace=None):
+    """Yield (name, route kwargs) for every named URL pattern."""
+    resolver = resolver or get_resolver()
+    for pattern in resolver.url_patterns:
+        if isinstance(pattern, URLResolver):
+            if pattern.namespace in SKIPPED_NAMESPACES:
+                continue
+            nested = ":".join(filter(None, [namespace, pattern.namespace]))
+            yield from get_named_routes(pattern, nested or None)
+        elif isinstance(pattern, URLPattern) and pattern.name:
+            name = f"{namespace}:{pattern.name}" if namespace else pattern.name
+            yield name, list(pattern.pattern.converters)
+
+
+class Command(BaseCommand):
+    help = (
+        "Request every named route through the test client and report p50/p95 "
+        "latency, query count and response size as JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--iterations",
+            type=int,
+            default=20,
+            help="Timed requests per route (default: 20).",
+        )
+        parser.add_argument(
+            "--warmup",
+            type=int,
+            default=2,
+            help="Untimed requests per route, e.g. to fill caches (default: 2).",
+        )
+        parser.add_argument(
+            "--username",
+            help="Log in as this user (default: the user following the most "
+            "profiles). Use --anonymous to benchmark logged out.",
+        )
+        parser.add_argument("--anonymous", action="store_true")
+        parser.add_argument(
+            "--route",
+            action="append",
+            dest="routes",
+            help="Only benchmark this route name (repeatable).",
+        )
+        parser.add_argument("--output", help="Write the JSON report to this file.")
+
+    def handle(self, *args, **options):
+        if options["iterations"] < 1:
+            raise CommandError("--iterations must be at least 1.")
+        # a non-internal address keeps the debug toolbar out of the timings
+        client = Client(
+            raise_request_exception=False,
+            SERVER_NAME="localhost",
+            REMOTE_ADDR="192.0.2.1",
+        )
+        user = None
+        if not options["anonymous"]:
+            user = self.get_user(options["username"])
+            client.force_login(user)
+
+        route_kwargs = self.get_route_kwargs(user)
+        results = []
+        for name, params in get_named_routes():
+            if name in SKIPPED_ROUTES or (
+                options["routes"] and name not in options["routes"]
+            ):
+                continue
+            kwargs = route_kwargs.get(name) or {
+                param: route_kwargs[param] for param in params if param in route_kwargs
+            }
+            if set(params) - set(kwargs):
+                self.stderr.write(f"Skipping {name}: no value for {params}.")
+                continue
+            url = reverse(name, kwargs=kwargs)
+            results.append(
+                self.benchmark(
+                    client, name, url, options["warmup"], options["iterations"]
+                )
+            )
+
+        report = {
+            "user": user.username if user else None,
+            "iterations": options["iterations"],
+            "warmup": options["warmup"],
+            "routes": results,
+        }
+        output = json.dumps(report, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                f.write(output + "\n")
+        else:
+            self.stdout.write(output)
+
+    def get_user(self, username):
+        if username:
+            try:
+                return User.objects.get(username=username)
+            except User.DoesNotExist:
+                raise CommandError(f"User {username!r} does not exist.")
+        profile = Profile.objects.select_related("user").order_by("-following_count")
+        profile = profile.first()
+        if profile is None:
+            raise CommandError("No users to log in as, run seed_data first.")
+        return profile.user
+
+    def get_route_kwargs(self, user):
+        """Sample values for route parameters, taken from existing data."""
+        post = (
+            Post.published.select_related("author")
+            .order_by("-likes_count", "-comments_count")
+            .first()
+        )
+        if post is None:
+            raise CommandError("No published posts, run seed_data first.")
+        author = post.author
+        kwargs = {
+            "username": author.username,
+            "post_slug": post.slug,
+            "pk": post.pk,
+            "section": "posts",
+        }
+        tags = get_top_tags()
+        if tags:
+            kwargs["tag_slug"] = tags[0]["slug"]
+
+        comments = Comment.objects.select_related("post")
+        if user is not None:
+            # only the author may open the edit and delete pages
+            comments = comments.filter(author=user)
+            own_post = Post.objects.filter(author=user).first()
+            if own_post is not None:
+                kwargs["blogs:post_update"] = {"post_slug": own_post.slug}
+                kwargs["blogs:post_delete"] = {"post_slug": own_post.slug}
+        comment = comments.first()
+        if comment is not None:
+            comment_kwargs = {"post_slug": comment.post.slug, "pk": comment.pk}
+            kwargs["blogs:comment_update"] = comment_kwargs
+            kwargs["blogs:comment_delete"] = comment_kwargs
+        return kwargs
+
+    def benchmark(self, client, name, url, warmup, iterations):
+        for _ in range(warmup):
+            client.get(url, secure=True)
+
+        timings = []
+        # every database alias, on this thread and the view's worker threads
+        metrics = RequestMetrics()
+        for _ in range(iterations):
+            with measure(metrics, instrument_caches=False):
+                start = time.perf_counter()
+                response = client.get(url, secure=True)
+                timings.append((time.perf_counter() - start) * 1000)
+
+        if len(timings) > 1:
+            cuts = statistics.quantiles(timings, n=100, method="inclusive")
+            p50, p95 = cuts[49], cuts[94]
+        else:
+            p50 = p95 = timings[0]
+        return {
+            "name": name,
+            "url": url,
+            "status": response.status_code,
+            "p50_ms": round(p50, 2),
+            "p95_ms": round(p95, 2),
+            "mean_ms": round(statistics.fmean(timings), 2),
+            "queries": metrics.db_queries / iterations,
+            "bytes": len(response.content),
+        }
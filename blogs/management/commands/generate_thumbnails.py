@@ -0,0 +1,69 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from blogs.images import render_thumbnail_variants, save_thumbnail_variants
+from blogs.models import Post
+
+
+def read_thumbnail(post):
+    with post.thumbnail.open("rb") as file:
+        return file.read()
+
+
+class Command(BaseCommand):
+    help = "Generate thumbnail variants and placeholders for existing posts."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=None,
+            help="Number of worker processes (default: number of CPUs).",
+        )
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Regenerate variants of posts that already have them.",
+        )
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(thumbnail="").only(
+            "thumbnail", "thumbnail_variants"
+        )
+        if not options["force"]:
+            posts = posts.filter(thumbnail_placeholder="")
+
+        # forked workers must not share the parent's database connections
+        connections.close_all()
+
+        done = 0
+        pending = list(posts)
+        workers = options["workers"] or os.cpu_count()
+        # images are decoded and resized in worker processes; files and rows
+        # are read and written here, a few images per worker at a time
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            while pending:
+                batch, pending = pending[: workers * 2], pending[workers * 2 :]
+                futures = {}
+                for post in batch:
+                    try:
+                        data = read_thumbnail(post)
+                    except OSError as exc:
+                        self.stderr.write(f"Skipping post {post.pk}: {exc}")
+                        continue
+                    futures[executor.submit(render_thumbnail_variants, data)] = post
+
+                for future in as_completed(futures):
+                    post = futures[future]
+                    try:
+                        variants, placeholder = future.result()
+                    except Exception as exc:
+                        self.stderr.write(f"Skipping post {post.pk}: {exc}")
+                        continue
+                    save_thumbnail_variants(post, variants, placeholder)
+                    done += 1
+
+        self.stdout.write(self.style.SUCCESS(f"Generated thumbnails for {done} posts."))
@@ -0,0 +1,353 @@
+import json
+import random
+import re
+import statistics
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from http.cookiejar import CookieJar, DefaultCookiePolicy
+from urllib.error import HTTPError, URLError
+from urllib.parse import urlencode, urlsplit
+from urllib.request import (
+    HTTPCookieProcessor,
+    HTTPRedirectHandler,
+    Request,
+    build_opener,
+)
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import Resolver404, resolve, reverse
+
+from blogs.models import Post
+
+User = get_user_model()
+
+# the VirtualUser methods that can be run as scenarios
+SCENARIOS = ("scroll", "timeline", "read", "feed", "like", "comment", "follow")
+DEFAULT_MIX = "scroll=35,read=30,feed=10,timeline=10,like=8,comment=4,follow=3"
+# upper bounds (ms) of the latency histogram buckets
+HISTOGRAM_BUCKETS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+NEXT_PAGE_RE = re.compile(r'hx-get="([^"]*cursor=[^"]*)"')
+CSRF_INPUT_RE = re.compile(r'name="csrfmiddlewaretoken" value="([^"]+)"')
+
+
+class InsecureCookiePolicy(DefaultCookiePolicy):
+    """Send the Secure session and CSRF cookies to a plain http test server."""
+
+    def return_ok_secure(self, cookie, request):
+        return True
+
+
+class NoRedirectHandler(HTTPRedirectHandler):
+    """Measure each request alone instead of following redirects."""
+
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class Recorder:
+    """Latencies and statuses per URL name, shared by all worker threads."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+        self.errors = defaultdict(int)
+
+    def record(self, name, status, elapsed_ms):
+        with self.lock:
+            self.latencies[name].append(elapsed_ms)
+            self.statuses[name][status] += 1
+            if status is None or status >= 500 or status in (403, 404, 405):
+                self.errors[name] += 1
+
+    def report(self, duration):
+        routes = []
+        total = errors = 0
+        for name, latencies in sorted(self.latencies.items()):
+            latencies.sort()
+            count = len(latencies)
+            total += count
+            errors += self.errors[name]
+            histogram = {}
+            for bound in HISTOGRAM_BUCKETS:
+                histogram[f"<={bound}ms"] = sum(1 for ms in latencies if ms <= bound)
+            histogram["+Inf"] = count
+            routes.append(
+                {
+                    "name": name,
+                    "requests": count,
+                    "throughput_rps": round(count / duration, 2),
+                    "error_rate": round(self.errors[name] / count, 4),
+                    "statuses": {
+                        str(status): n for status, n in self.statuses[name].items()
+                    },
+                    "p50_ms": round(percentile(latencies, 50), 2),
+                    "p90_ms": round(percentile(latencies, 90), 2),
+                    "p99_ms": round(percentile(latencies, 99), 2),
+                    "max_ms": round(latencies[-1], 2),
+                    "mean_ms": round(statistics.fmean(latencies), 2),
+                    # cumulative, like Prometheus histograms
+                    "histogram": histogram,
+                }
+            )
+        return {
+            "duration_s": round(duration, 2),
+            "requests": total,
+            "throughput_rps": round(total / duration, 2) if duration else 0,
+            "error_rate": round(errors / total, 4) if total else 0,
+            "routes": routes,
+        }
+
+
+def percentile(sorted_values, percent):
+    index = max(int(round(percent / 100 * len(sorted_values))) - 1, 0)
+    return sorted_values[min(index, len(sorted_values) - 1)]
+
+
+def get_url_name(path):
+    try:
+        return resolve(urlsplit(path).path).view_name
+    except Resolver404:
+        return "unresolved"
+
+
+class VirtualUser:
+    """A logged-in reader with its own cookies, running scenarios."""
+
+    def __init__(self, command, user, password):
+        self.command = command
+        self.user = user
+        self.password = password
+        self.rng = random.Random()
+        self.opener = build_opener(
+            HTTPCookieProcessor(CookieJar(policy=InsecureCookiePolicy())),
+            NoRedirectHandler(),
+        )
+        self.csrf_token = ""
+        self.etag = None
+
+    def request(self, path, data=None, headers=None):
+        """Send a request and record it, returning (status, headers, body)."""
+        headers = {"Referer": self.command.base_url + path, **(headers or {})}
+        if data is not None:
+            headers["X-CSRFToken"] = self.csrf_token
+            data = urlencode(data).encode()
+        request = Request(self.command.base_url + path, data=data, headers=headers)
+
+        start = time.perf_counter()
+        try:
+            with self.opener.open(request, timeout=self.command.timeout) as response:
+                status, response_headers = response.status, response.headers
+                body = response.read()
+        except HTTPError as error:
+            status, response_headers, body = error.code, error.headers, error.read()
+        except (URLError, OSError):
+            status, response_headers, body = None, {}, b""
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        self.command.recorder.record(get_url_name(path), status, elapsed_ms)
+        return status, response_headers, body.decode(errors="replace")
+
+    def login(self):
+        login_url = reverse("accounts:login")
+        _, _, body = self.request(login_url)
+        match = CSRF_INPUT_RE.search(body)
+        self.csrf_token = match.group(1) if match else ""
+        status, _, _ = self.request(
+            login_url,
+            {
+                "csrfmiddlewaretoken": self.csrf_token,
+                "username": self.user.email,
+                "password": self.password,
+            },
+        )
+        if status != 302:
+            raise CommandError(f"Could not log in as {self.user.email}.")
+        # the token rotates on login, fetch the new one
+        _, _, body = self.request(reverse("blogs:post_create"))
+        match = CSRF_INPUT_RE.search(body)
+        self.csrf_token = match.group(1) if match else ""
+
+    def random_post(self):
+        return self.rng.choice(self.command.posts)
+
+    def scroll(self):
+        """Open the home page and scroll through a few pages."""
+        _, _, body = self.request(reverse("blogs:index"))
+        for _ in range(self.rng.randint(1, 5)):
+            match = NEXT_PAGE_RE.search(body)
+            if not match:
+                break
+            _, _, body = self.request(
+                match.group(1).replace("&amp;", "&"), headers={"HX-Request": "true"}
+            )
+
+    def timeline(self):
+        self.request(reverse("blogs:timeline"))
+
+    def read(self):
+        """Read a post, then maybe its comments and likers."""
+        post = self.random_post()
+        self.request(post["url"])
+        if self.rng.random() < 0.3:
+            self.request(
+                reverse("blogs:post_comments", args=[post["pk"]]),
+                headers={"HX-Request": "true"},
+            )
+        if self.rng.random() < 0.2:
+            self.request(
+                reverse("blogs:post_likers", args=[post["pk"]]),
+                headers={"HX-Request": "true"},
+            )
+
+    def feed(self):
+        """Poll the RSS feed like a feed reader, with a conditional GET."""
+        headers = {"If-None-Match": self.etag} if self.etag else {}
+        status, response_headers, _ = self.request(
+            reverse("post_feed"), headers=headers
+        )
+        if status == 200:
+            self.etag = response_headers.get("ETag")
+
+    def like(self):
+        """Like a post, or take a like back; contends on the likes rows."""
+        post = self.random_post()
+        action = self.rng.choice(["blogs:post_like", "blogs:post_unlike"])
+        self.request(reverse(action, args=[post["pk"]]), {})
+
+    def comment(self):
+        post = self.random_post()
+        self.request(post["url"], {"comment": "<p>Load test comment.</p>"})
+
+    def follow(self):
+        """Toggle following a popular author; contends on the follows rows."""
+        author_id = self.rng.choice(self.command.authors)
+        if author_id != self.user.pk:
+            self.request(reverse("users:follow-toggle", args=[author_id]), {})
+
+
+class Command(BaseCommand):
+    help = (
+        "Drive a running server with concurrent logged-in users following a "
+        "weighted traffic mix, and report throughput, error rate and latency "
+        "histograms per URL name as JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--base-url",
+            default="http://127.0.0.1:8000",
+            help="Server to load, e.g. started with gunicorn (default: %(default)s).",
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=20,
+            help="Number of concurrent virtual users (default: 20).",
+        )
+        parser.add_argument(
+            "--duration",
+            type=float,
+            default=60,
+            help="Seconds to run the scenarios for (default: 60).",
+        )
+        parser.add_argument(
+            "--mix",
+            default=DEFAULT_MIX,
+            help=f"Weighted scenarios as name=weight pairs (default: {DEFAULT_MIX}).",
+        )
+        parser.add_argument(
+            "--username-prefix",
+            default="seed_",
+            help="Log in as users whose username starts with this (default: seed_).",
+        )
+        parser.add_argument(
+            "--password",
+            default="password",
+            help="Password of those users (default: password).",
+        )
+        parser.add_argument("--timeout", type=float, default=30)
+        parser.add_argument("--output", help="Write the JSON report to this file.")
+
+    def handle(self, *args, **options):
+        self.base_url = options["base_url"].rstrip("/")
+        self.timeout = options["timeout"]
+        self.recorder = Recorder()
+        scenarios, weights = self.parse_mix(options["mix"])
+
+        users = list(
+            User.objects.filter(
+                username__startswith=options["username_prefix"]
+            ).order_by("?")[: options["concurrency"]]
+        )
+        if not users:
+            raise CommandError("No users to log in as, run seed_data first.")
+        posts = Post.published.select_related("author").only("slug", "author__username")
+        self.posts = [
+            {"pk": post.pk, "url": post.get_absolute_url()}
+            for post in posts.order_by("-publish")[:500]
+        ]
+        if not self.posts:
+            raise CommandError("No published posts, run seed_data first.")
+        self.authors = list(
+            User.objects.order_by("-profile__followers_count").values_list(
+                "pk", flat=True
+            )[:20]
+        )
+
+        virtual_users = [
+            VirtualUser(self, users[n % len(users)], options["password"])
+            for n in range(options["concurrency"])
+        ]
+        # one at a time: password hashing would dominate a concurrent start
+        for virtual_user in virtual_users:
+            virtual_user.login()
+        # logins are not part of the measured traffic
+        self.recorder = Recorder()
+        with ThreadPoolExecutor(max_workers=len(virtual_users)) as executor:
+            start = time.perf_counter()
+            deadline = start + options["duration"]
+            futures = [
+                executor.submit(self.run_user, user, scenarios, weights, deadline)
+                for user in virtual_users
+            ]
+            for future in futures:
+                future.result()
+            duration = time.perf_counter() - start
+
+        report = {
+            "base_url": self.base_url,
+            "concurrency": len(virtual_users),
+            "mix": dict(zip(scenarios, weights)),
+            **self.recorder.report(duration),
+        }
+        output = json.dumps(report, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                f.write(output + "\n")
+        else:
+            self.stdout.write(output)
+
+    def parse_mix(self, mix):
+        scenarios, weights = [], []
+        for item in mix.split(","):
+            name, _, weight = item.partition("=")
+            name = name.strip()
+            if name not in SCENARIOS:
+                raise CommandError(
+                    f"Unknown scenario {name!r}, expected one of {', '.join(SCENARIOS)}."
+                )
+            try:
+                weights.append(float(weight))
+            except ValueError:
+                raise CommandError(f"Invalid weight for {name!r}: {weight!r}.")
+            scenarios.append(name)
+        return scenarios, weights
+
+    def run_user(self, user, scenarios, weights, deadline):
+        while time.perf_counter() < deadline:
+            scenario = user.rng.choices(scenarios, weights=weights)[0]
+            getattr(user, scenario)()
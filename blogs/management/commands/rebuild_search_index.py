@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+
+from blogs.models import Post
+from blogs.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = "Rebuild the post search index with the configured search backend."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=500,
+            help="Number of posts loaded at a time (default: 500).",
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = options["chunk_size"]
+        backend = get_search_backend()
+        backend.setup()
+
+        queryset = (
+            Post.objects.select_related("author")
+            .prefetch_related("tags")
+            .order_by("pk")
+        )
+        last_pk = 0
+        total = 0
+        while True:
+            posts = list(queryset.filter(pk__gt=last_pk)[:chunk_size])
+            if not posts:
+                break
+            for post in posts:
+                backend.index_post(post)
+            total += len(posts)
+            last_pk = posts[-1].pk
+            self.stdout.write(f"Indexed {total} posts...")
+
+        self.stdout.write(self.style.SUCCESS(f"Indexed {total} posts."))
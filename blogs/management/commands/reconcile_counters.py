@@ -0,0 +1,55 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from blogs.models import Comment, Post
+
+
+class Command(BaseCommand):
+    help = "Rebuild the denormalized likes_count and comments_count of posts."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of posts updated per statement (default: 1000).",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+
+        likes = (
+            Post.likes.through.objects.filter(post_id=OuterRef("pk"))
+            .order_by()
+            .values("post_id")
+            .annotate(total=Count("*"))
+            .values("total")
+        )
+        comments = (
+            Comment.objects.filter(post_id=OuterRef("pk"), active=True)
+            .order_by()
+            .values("post_id")
+            .annotate(total=Count("*"))
+            .values("total")
+        )
+
+        # walk the table in primary key ranges so each UPDATE stays short
+        ids = Post.objects.order_by("pk").values_list("pk", flat=True)
+        last_pk = 0
+        updated = 0
+        while True:
+            batch = list(ids.filter(pk__gt=last_pk)[:batch_size])
+            if not batch:
+                break
+            updated += Post.objects.filter(pk__gte=batch[0], pk__lte=batch[-1]).update(
+                likes_count=Coalesce(Subquery(likes, output_field=IntegerField()), 0),
+                comments_count=Coalesce(
+                    Subquery(comments, output_field=IntegerField()), 0
+                ),
+            )
+            last_pk = batch[-1]
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Reconciled counters of {updated} posts.")
+        )
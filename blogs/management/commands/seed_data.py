@@ -0,0 +1,234 @@
+import random
+import uuid
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.contrib.contenttypes.models import ContentType
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.template.defaultfilters import slugify
+from django.utils import timezone
+from taggit.models import Tag, TaggedItem
+
+from accounts.models import Profile
+from blogs.feeds import invalidate_feeds
+from blogs.models import Comment, Post
+from blogs.tag_index import invalidate_tag_index
+from blogs.timeline import rebuild_timeline
+
+User = get_user_model()
+
+WORDS = """
+    access algorithm api async backend benchmark browser buffer build cache
+    client cloud cluster code compiler concurrency container cursor data
+    database debug deploy design django docker editor engine error event
+    feature file framework function graph index interface javascript kernel
+    latency library linux logging memory migration model network object
+    orm pagination parser pattern performance pipeline postgres process
+    profile python query queue react redis release request response router
+    schema search security server session shell signal socket sql storage
+    stream system template test thread token transaction type update user
+    version view web worker
+""".split()
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed the database with a synthetic dataset (users, follows, posts, tags, "
+        "comments and likes) for benchmarking."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=200)
+        parser.add_argument("--posts", type=int, default=2000)
+        parser.add_argument("--tags", type=int, default=40)
+        parser.add_argument(
+            "--follows", type=int, default=20, help="Average follows per user."
+        )
+        parser.add_argument(
+            "--comments", type=int, default=5, help="Average comments per post."
+        )
+        parser.add_argument(
+            "--likes", type=int, default=10, help="Average likes per post."
+        )
+        parser.add_argument(
+            "--drafts",
+            type=float,
+            default=0.1,
+            help="Fraction of posts left as drafts (default: 0.1).",
+        )
+        parser.add_argument(
+            "--password",
+            default="password",
+            help="Password of the seeded users (default: password).",
+        )
+        parser.add_argument("--seed", type=int, default=None, help="Random seed.")
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of rows inserted per statement (default: 1000).",
+        )
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options["seed"])
+        self.batch_size = options["batch_size"]
+        # keeps usernames, emails and titles unique across runs
+        self.run = uuid.uuid4().hex[:8]
+
+        users = self.create_users(options["users"], options["password"])
+        # a few authors get most of the follows, likes and posts
+        popularity = [self.rng.paretovariate(1.2) for _ in users]
+        self.create_follows(users, popularity, options["follows"])
+        posts = self.create_posts(users, popularity, options["posts"], options)
+        published = [post for post in posts if post.status == Post.Status.PUBLISHED]
+        self.create_tags(posts, options["tags"])
+        self.create_comments(published, users, options["comments"])
+        self.create_likes(published, users, options["likes"])
+
+        # bulk_create skips the signals maintaining the derived data
+        for command in (
+            "reconcile_counters",
+            "reconcile_follow_counts",
+            "rebuild_search_index",
+        ):
+            call_command(command, stdout=self.stdout)
+        for user in users:
+            rebuild_timeline(user.pk)
+        invalidate_tag_index()
+        invalidate_feeds()
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Seeded {len(users)} users and {len(posts)} posts "
+                f"(usernames seed_{self.run}_N, password {options['password']!r})."
+            )
+        )
+
+    def bulk_create(self, model, objs, **kwargs):
+        # PostgreSQL, SQLite 3.35+ and MariaDB 10.5+ set the primary keys
+        created = model.objects.bulk_create(objs, batch_size=self.batch_size, **kwargs)
+        self.stdout.write(f"Created {len(objs)} {model._meta.verbose_name_plural}.")
+        return created
+
+    def sentence(self, words):
+        return " ".join(self.rng.choices(WORDS, k=words)).capitalize()
+
+    def create_users(self, count, password):
+        password = make_password(password)
+        users = self.bulk_create(
+            User,
+            [
+                User(
+                    username=f"seed_{self.run}_{n}",
+                    email=f"seed_{self.run}_{n}@example.com",
+                    first_name=self.rng.choice(WORDS).capitalize(),
+                    last_name=self.rng.choice(WORDS).capitalize(),
+                    headline=self.sentence(6),
+                    password=password,
+                )
+                for n in range(count)
+            ],
+        )
+        # bulk_create doesn't send the post_save creating profiles
+        profiles = self.bulk_create(Profile, [Profile(user=user) for user in users])
+        for user, profile in zip(users, profiles):
+            user.profile_id = profile.pk
+        return users
+
+    def create_follows(self, users, popularity, average):
+        follows = set()
+        for user in users:
+            for author in self.rng.choices(
+                users, weights=popularity, k=self.rng.randint(0, average * 2)
+            ):
+                if author is not user:
+                    follows.add((user.profile_id, author.profile_id))
+        self.bulk_create(
+            Profile.follows.through,
+            [
+                Profile.follows.through(from_profile_id=follower, to_profile_id=author)
+                for follower, author in follows
+            ],
+            ignore_conflicts=True,
+        )
+
+    def create_posts(self, users, popularity, count, options):
+        now = timezone.now()
+        posts = []
+        for n in range(count):
+            paragraphs = [
+                f"<p>{self.sentence(self.rng.randint(40, 120))}.</p>"
+                for _ in range(self.rng.randint(2, 12))
+            ]
+            title = f"{self.sentence(self.rng.randint(3, 8))} {self.run}-{n}"
+            post = Post(
+                title=title,
+                slug=slugify(title),
+                overview=self.sentence(15),
+                content="\n".join(paragraphs),
+                author=self.rng.choices(users, weights=popularity)[0],
+                status=(
+                    Post.Status.DRAFT
+                    if self.rng.random() < options["drafts"]
+                    else Post.Status.PUBLISHED
+                ),
+            )
+            post.update_derived_content()
+            posts.append(post)
+        posts = self.bulk_create(Post, posts)
+
+        # publish is auto_now_add, spread it over the past year afterwards
+        for post in posts:
+            post.publish = now - timedelta(minutes=self.rng.randint(0, 525600))
+        Post.objects.bulk_update(posts, ["publish"], batch_size=self.batch_size)
+        return posts
+
+    def create_tags(self, posts, count):
+        names = self.rng.sample(WORDS, min(count, len(WORDS)))
+        Tag.objects.bulk_create(
+            [Tag(name=name, slug=slugify(name)) for name in names],
+            ignore_conflicts=True,
+        )
+        tags = list(Tag.objects.filter(name__in=names))
+        weights = [self.rng.paretovariate(1.5) for _ in tags]
+        content_type = ContentType.objects.get_for_model(Post)
+        self.bulk_create(
+            TaggedItem,
+            [
+                TaggedItem(tag=tag, content_type=content_type, object_id=post.pk)
+                for post in posts
+                for tag in set(
+                    self.rng.choices(tags, weights=weights, k=self.rng.randint(1, 4))
+                )
+            ],
+        )
+
+    def create_comments(self, posts, users, average):
+        self.bulk_create(
+            Comment,
+            [
+                Comment(
+                    post=post,
+                    author=self.rng.choice(users),
+                    comment=f"<p>{self.sentence(self.rng.randint(5, 40))}.</p>",
+                )
+                for post in posts
+                for _ in range(self.rng.randint(0, average * 2))
+            ],
+        )
+
+    def create_likes(self, posts, users, average):
+        PostLike = Post.likes.through
+        self.bulk_create(
+            PostLike,
+            [
+                PostLike(post_id=post.pk, customuser_id=user.pk)
+                for post in posts
+                for user in self.rng.sample(
+                    users, min(len(users), self.rng.randint(0, average * 2))
+                )
+            ],
+            ignore_conflicts=True,
+        )
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from blogs.trending import update_trending
+
+
+class Command(BaseCommand):
+    help = (
+        "Rescore the trending posts from the growth of their likes, comments "
+        "and views. Run it periodically, e.g. every 10 minutes from cron."
+    )
+
+    def handle(self, *args, **options):
+        scored = update_trending()
+        self.stdout.write(self.style.SUCCESS(f"Scored {scored} trending posts."))
@@ -1,14 +1,39 @@
 from html import unescape
 
 from django.conf import settings
+from django.core.files.storage import default_storage
 from django.db import models
+from django.db.models import Exists, F, OuterRef, Value
+from django.db.models.functions import Greatest
 from django.template.defaultfilters import slugify
 from django.urls import reverse
 from django.utils.html import strip_tags
+from django.utils.text import Truncator
 from taggit.managers import TaggableManager
 
+from config.db import LoadedValuesMixin
 
-class PublishedManager(models.Manager):
+# number of words kept in Post.excerpt
+EXCERPT_WORDS = 30
+DERIVED_SOURCE_FIELDS = {"title", "content"}
+DERIVED_CONTENT_FIELDS = {"word_count", "read_time_minutes", "excerpt"}
+
+
+class PostQuerySet(models.QuerySet):
+    def with_liked_by(self, user):
+        """
+        Annotate each post with `is_liked_by_me`, computed for `user` with an
+        EXISTS subquery so a whole page is resolved in the same query.
+        """
+        if not user.is_authenticated:
+            return self.annotate(is_liked_by_me=Value(False))
+        likes = Post.likes.through.objects.filter(
+            post_id=OuterRef("pk"), customuser_id=user.pk
+        )
+        return self.annotate(is_liked_by_me=Exists(likes))
+
+
+class PublishedManager(models.Manager.from_queryset(PostQuerySet)):
     """
     Custom Manager
     Returns: Post with 'PUBLISHED' status
@@ -18,7 +43,7 @@ class PublishedManager(models.Manager):
         return super().get_queryset().filter(status=Post.Status.PUBLISHED)
 
 
-class Post(models.Model):
+class Post(LoadedValuesMixin, models.Model):
     class Status(models.TextChoices):
         DRAFT = "DF", "Draft"
         PUBLISHED = "PB", "Published"
@@ -38,6 +63,11 @@ class Post(models.Model):
         blank=True,
         help_text="Upload an image to accompany this post.",
     )
+    # resized WebP versions of the thumbnail, generated by blogs.images:
+    # [{"width": ..., "height": ..., "name": ...}], narrowest first
+    thumbnail_variants = models.JSONField(default=list, blank=True, editable=False)
+    # tiny blurred version of the thumbnail as a data URI
+    thumbnail_placeholder = models.TextField(blank=True, editable=False)
     status = models.CharField(
         max_length=2, choices=Status.choices, default=Status.DRAFT
     )
@@ -54,14 +84,25 @@ class Post(models.Model):
     )
     publish = models.DateTimeField(auto_now_add=True)
     updated = models.DateTimeField(auto_now=True)
+    # denormalized counters, kept in sync by blogs.signals
+    likes_count = models.PositiveIntegerField(default=0, editable=False)
+    comments_count = models.PositiveIntegerField(default=0, editable=False)
+    # buffered and flushed periodically by blogs.view_counts
+    view_count = models.PositiveIntegerField(default=0, editable=False)
+    # derived from title and content on save
+    word_count = models.PositiveIntegerField(default=0, editable=False)
+    read_time_minutes = models.PositiveSmallIntegerField(default=1, editable=False)
+    excerpt = models.CharField(max_length=500, blank=True, editable=False)
 
-    objects = models.Manager()  # default Manager
+    objects = PostQuerySet.as_manager()  # default Manager
     published = PublishedManager()  # custom Manager
 
     class Meta:
         ordering = ["-publish"]
         indexes = [
             models.Index(fields=["-publish"]),
+            # the author dashboard, filtered by status and sorted by date
+            models.Index(fields=["author", "status", "-publish"]),
         ]
 
     def __str__(self):
@@ -75,17 +116,45 @@ class Post(models.Model):
 
     def save(self, *args, **kwargs):
         self.slug = slugify(self.title)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None or DERIVED_SOURCE_FIELDS & set(update_fields):
+            self.update_derived_content()
+            if update_fields is not None:
+                kwargs["update_fields"] = set(update_fields) | DERIVED_CONTENT_FIELDS
         return super().save(*args, **kwargs)
 
+    def update_derived_content(self):
+        """
+        Compute the word count, read time and plain-text excerpt
+        from the title and the HTML content.
+        """
+        words = unescape(strip_tags(self.content)).split()
+        self.word_count = len(self.title.split()) + len(words)
+        # 200 = assumed average reading speed of words per minute
+        self.read_time_minutes = max(round(self.word_count / 200), 1)
+        self.excerpt = Truncator(" ".join(words)).words(EXCERPT_WORDS)[:500]
+
     def get_read_time(self):
-        """Calculate the estimated read time for the content of the object."""
+        """Return the estimated read time in minutes."""
+        return self.read_time_minutes
 
-        # calculates the read time based on the total word count of the title, and content
-        string = self.title + unescape(strip_tags(self.content))
-        total_words = len(string.split())
-        # 200 = assumed average reading speed of words per minute
-        read_time = round(total_words / 200)
-        return max(read_time, 1)
+    def get_thumbnail_srcset(self):
+        """`srcset` attribute value listing the thumbnail variants."""
+        return ", ".join(
+            f"{default_storage.url(variant['name'])} {variant['width']}w"
+            for variant in self.thumbnail_variants
+        )
+
+    def get_thumbnail_fallback(self):
+        """
+        The variant used as `src` (the widest one up to 960px) with its url,
+        or None while the variants are being generated.
+        """
+        fitting = [v for v in self.thumbnail_variants if v["width"] <= 960]
+        variant = (fitting or self.thumbnail_variants or [None])[-1]
+        if variant is None:
+            return None
+        return {**variant, "url": default_storage.url(variant["name"])}
 
     def get_comments(self):
         return self.comments.filter(active=True).select_related(
@@ -101,11 +170,49 @@ class Post(models.Model):
     def get_likes(self):
         return self.likes.all()
 
+    def is_liked_by(self, user):
+        return (
+            user.is_authenticated
+            and Post.likes.through.objects.filter(
+                post_id=self.pk, customuser_id=user.pk
+            ).exists()
+        )
+
+    def like(self, user):
+        """
+        Add a like from `user`. Liking twice, even concurrently, keeps a
+        single like. Returns True if a like was added.
+        """
+        _, created = Post.likes.through.objects.get_or_create(
+            post_id=self.pk, customuser_id=user.pk
+        )
+        if created:
+            # blogs.dashboard imports this module
+            from .dashboard import invalidate_dashboard_stats
+
+            Post.objects.filter(pk=self.pk).update(likes_count=F("likes_count") + 1)
+            invalidate_dashboard_stats(self.author_id)
+        return created
+
+    def unlike(self, user):
+        """Remove the like of `user`, if any. Returns True if one was removed."""
+        deleted, _ = Post.likes.through.objects.filter(
+            post_id=self.pk, customuser_id=user.pk
+        ).delete()
+        if deleted:
+            from .dashboard import invalidate_dashboard_stats
+
+            Post.objects.filter(pk=self.pk).update(
+                likes_count=Greatest(F("likes_count") - deleted, 0)
+            )
+            invalidate_dashboard_stats(self.author_id)
+        return bool(deleted)
+
     def get_likes_count(self):
         return self.likes.count()
 
 
-class Comment(models.Model):
+class Comment(LoadedValuesMixin, models.Model):
     post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name="comments")
     comment = models.TextField()
     author = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
@@ -118,6 +225,10 @@ class Comment(models.Model):
         ordering = ["-created"]
         indexes = [
             models.Index(fields=["created"]),
+            # the paginated comments of a post, see PostCommentsView
+            models.Index(fields=["post", "active", "created"]),
+            # the comments list of the author, see UserCommentsListView
+            models.Index(fields=["author", "-created"]),
         ]
 
     def __str__(self) -> str:
@@ -128,3 +239,96 @@ class Comment(models.Model):
             "blogs:post_detail",
             kwargs={"username": self.author.username, "post_slug": self.post.slug},
         )
+
+
+class SearchDocument(models.Model):
+    """Plain-text copy of a post's searchable fields, maintained by blogs.search."""
+
+    post = models.OneToOneField(
+        Post,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="search_document",
+    )
+    title = models.TextField()
+    body = models.TextField(blank=True)
+    tags = models.TextField(blank=True)
+    author = models.TextField(blank=True)
+    updated = models.DateTimeField(auto_now=True)
+
+    def __str__(self) -> str:
+        return self.title
+
+
+class SearchTerm(models.Model):
+    """Inverted index entry: a term occurring in a post and its weight."""
+
+    term = models.CharField(max_length=64)
+    post = models.ForeignKey(
+        Post, on_delete=models.CASCADE, related_name="search_terms"
+    )
+    weight = models.PositiveIntegerField()
+
+    class Meta:
+        constraints = [
+            # also serves as the (term, post) lookup index
+            models.UniqueConstraint(
+                fields=["term", "post"], name="unique_search_term_post"
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return self.term
+
+
+class TimelineEntry(models.Model):
+    """A post in a reader's "following" timeline, written by blogs.timeline."""
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="timeline_entries",
+    )
+    post = models.ForeignKey(
+        Post, on_delete=models.CASCADE, related_name="timeline_entries"
+    )
+    # copied from the post so the timeline is read from this table alone
+    publish = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "post"], name="unique_timeline_entry"
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=["user", "-publish", "-post"], name="timeline_entry_user_idx"
+            ),
+        ]
+        verbose_name_plural = "timeline entries"
+
+    def __str__(self) -> str:
+        return f"{self.post} in the timeline of {self.user}"
+
+
+class TrendingPost(models.Model):
+    """The trending score of a recent published post, written by blogs.trending."""
+
+    post = models.OneToOneField(
+        Post, on_delete=models.CASCADE, primary_key=True, related_name="trending"
+    )
+    score = models.FloatField(default=0)
+    # the post's counters when it was last scored, the next run adds their growth
+    likes_seen = models.PositiveIntegerField(default=0)
+    comments_seen = models.PositiveIntegerField(default=0)
+    views_seen = models.PositiveIntegerField(default=0)
+    scored_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["-score"], name="trending_post_score_idx"),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.post} ({self.score:.2f})"
@@ -0,0 +1,186 @@
+"""
+Keyset (cursor) pagination.
+
+Instead of ``?page=N`` (an OFFSET plus a COUNT(*) query), pages are
+addressed by an opaque cursor holding the ordering values of the last
+row served. The next page is fetched with a ``WHERE (publish, id) < (...)``
+style filter, so every page costs the same index range scan no matter
+how deep the reader scrolls, and rows published mid-scroll do not shift
+the following pages.
+"""
+
+import base64
+import json
+from datetime import date, datetime
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from django.http import Http404
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+class CursorPage:
+    """A page of results and the cursor pointing at the following page."""
+
+    def __init__(self, object_list, next_cursor, paginator):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.paginator = paginator
+
+    def __repr__(self):
+        return f"<CursorPage of {len(self.object_list)} items>"
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return False
+
+    def has_other_pages(self):
+        return self.has_next()
+
+
+class CursorPaginator:
+    """
+    Paginate a queryset by keyset on `ordering`, a sequence of field names
+    (optionally prefixed with "-") that must end with a unique field.
+    """
+
+    def __init__(self, queryset, per_page, ordering=("-publish", "-id")):
+        self.queryset = queryset
+        self.per_page = int(per_page)
+        self.ordering = tuple(ordering)
+        self.fields = [field.lstrip("-") for field in self.ordering]
+
+    def encode_cursor(self, obj):
+        values = []
+        for field in self.fields:
+            value = getattr(obj, field)
+            if isinstance(value, (date, datetime)):
+                value = value.isoformat()
+            values.append(value)
+        data = json.dumps(values, separators=(",", ":")).encode()
+        return base64.urlsafe_b64encode(data).decode().rstrip("=")
+
+    def decode_cursor(self, cursor):
+        try:
+            padded = cursor + "=" * (-len(cursor) % 4)
+            values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        except (TypeError, ValueError) as exc:
+            raise InvalidCursor("Malformed cursor.") from exc
+        if not isinstance(values, list) or len(values) != len(self.fields):
+            raise InvalidCursor("Cursor does not match the ordering.")
+
+        opts = self.queryset.model._meta
+        decoded = []
+        for field_name, value in zip(self.fields, values):
+            try:
+                field = opts.get_field("pk" if field_name == "pk" else field_name)
+            except FieldDoesNotExist:
+                # annotations such as a search rank are stored as is
+                decoded.append(value)
+                continue
+            try:
+                decoded.append(field.to_python(value))
+            except ValidationError as exc:
+                raise InvalidCursor("Cursor holds an invalid value.") from exc
+        return decoded
+
+    def get_keyset_filter(self, values):
+        """
+        Build the "comes after" condition, e.g. for (-publish, -id):
+        publish < p OR (publish = p AND id < i).
+        """
+        condition = Q()
+        equal = Q()
+        for ordering, field, value in zip(self.ordering, self.fields, values):
+            lookup = "lt" if ordering.startswith("-") else "gt"
+            condition |= equal & Q(**{f"{field}__{lookup}": value})
+            equal &= Q(**{field: value})
+        return condition
+
+    def get_page_queryset(self, cursor=None):
+        queryset = self.queryset.order_by(*self.ordering)
+        if cursor:
+            queryset = queryset.filter(
+                self.get_keyset_filter(self.decode_cursor(cursor))
+            )
+        # fetch one extra row to know whether there is a next page
+        return queryset[: self.per_page + 1]
+
+    def build_page(self, object_list):
+        next_cursor = None
+        if len(object_list) > self.per_page:
+            object_list = object_list[: self.per_page]
+            next_cursor = self.encode_cursor(object_list[-1])
+        return CursorPage(object_list, next_cursor, self)
+
+    def page(self, cursor=None):
+        """Return the page following `cursor`, or the first page."""
+        return self.build_page(list(self.get_page_queryset(cursor)))
+
+    async def apage(self, cursor=None):
+        """Async version of page(), using the async ORM."""
+        return self.build_page([obj async for obj in self.get_page_queryset(cursor)])
+
+
+class CursorPaginationMixin:
+    """
+    Replace the page-number pagination of a ListView with cursor
+    pagination read from the `cursor` GET parameter. Other views paginate
+    with get_cursor_page(), so a bad cursor is a 404 everywhere.
+    """
+
+    cursor_ordering = ("-publish", "-id")
+    cursor_kwarg = "cursor"
+    # set by apaginate_queryset(), in async views
+    cursor_page = None
+
+    def get_cursor_ordering(self):
+        return self.cursor_ordering
+
+    def get_cursor_paginator(self, queryset, page_size):
+        return CursorPaginator(queryset, page_size, self.get_cursor_ordering())
+
+    def get_cursor_page(self, queryset, page_size):
+        """The page following the request's cursor, 404 on an invalid cursor."""
+        paginator = self.get_cursor_paginator(queryset, page_size)
+        try:
+            return paginator.page(self.request.GET.get(self.cursor_kwarg))
+        except InvalidCursor:
+            raise Http404("Invalid cursor.")
+
+    async def aget_cursor_page(self, queryset, page_size):
+        """Async version of get_cursor_page(), using the async ORM."""
+        paginator = self.get_cursor_paginator(queryset, page_size)
+        try:
+            return await paginator.apage(self.request.GET.get(self.cursor_kwarg))
+        except InvalidCursor:
+            raise Http404("Invalid cursor.")
+
+    def paginate_queryset(self, queryset, page_size):
+        if self.cursor_page is not None:
+            return self.cursor_page
+        page = self.get_cursor_page(queryset, page_size)
+        return (page.paginator, page, page.object_list, page.has_next())
+
+    async def apaginate_queryset(self, queryset, page_size):
+        """
+        Fetch the page with the async ORM, ahead of get_context_data(),
+        which then uses it.
+        """
+        page = await self.aget_cursor_page(queryset, page_size)
+        self.cursor_page = (page.paginator, page, page.object_list, page.has_next())
+        return self.cursor_page
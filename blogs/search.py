@@ -0,0 +1,186 @@
+"""
+Full-text search over posts.
+
+Each post has a SearchDocument holding the plain text of its title,
+content, tags and author name. A search backend indexes these documents
+and ranks posts for a query. The backend is selected with the
+SEARCH_BACKEND setting:
+
+- InvertedIndexSearchBackend: portable, keeps weighted terms in the
+  SearchTerm table (works on SQLite).
+- PostgresSearchBackend: a generated, weighted tsvector column with a
+  GIN index on the SearchDocument table.
+"""
+
+import re
+from functools import lru_cache
+from html import unescape
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.db.models import Count, FloatField, Sum, Value
+from django.db.models.expressions import RawSQL
+from django.utils.html import strip_tags
+from django.utils.module_loading import import_string
+
+from .models import Post, SearchDocument, SearchTerm
+
+TOKEN_RE = re.compile(r"\w+")
+STOP_WORDS = frozenset(
+    "a an and are as at be but by for from has have in is it its of on or "
+    "that the this to was were will with".split()
+)
+MAX_TERM_LENGTH = SearchTerm._meta.get_field("term").max_length
+
+
+def tokenize(text):
+    """Split text into lowercase index terms, dropping stop words."""
+    return [
+        token[:MAX_TERM_LENGTH]
+        for token in TOKEN_RE.findall(text.lower())
+        if (len(token) > 1 or token.isdigit()) and token not in STOP_WORDS
+    ]
+
+
+def build_document(post):
+    """Return the SearchDocument field values for a post."""
+    author = post.author
+    return {
+        "title": post.title,
+        "body": unescape(strip_tags(post.content)),
+        "tags": " ".join(tag.name for tag in post.tags.all()),
+        "author": get_author_text(author),
+    }
+
+
+def get_author_text(user):
+    return f"{user.get_full_name()} {user.username}"
+
+
+class BaseSearchBackend:
+    """Interface every search backend implements."""
+
+    def setup(self):
+        """Create any database objects the backend needs."""
+
+    def index_post(self, post):
+        """Add or refresh a single post in the index."""
+        values = build_document(post)
+        SearchDocument.objects.update_or_create(post=post, defaults=values)
+        return values
+
+    def index_author(self, user):
+        """Refresh the posts of an author whose name changed."""
+        stale = SearchDocument.objects.filter(post__author=user).exclude(
+            author=get_author_text(user)
+        )
+        if not stale.exists():
+            return
+        posts = Post.objects.filter(author=user).select_related("author")
+        for post in posts.prefetch_related("tags"):
+            self.index_post(post)
+
+    def search(self, queryset, query):
+        """
+        Filter a Post queryset down to the posts matching `query`, annotated
+        with `search_rank` and ordered by relevance.
+        """
+        raise NotImplementedError
+
+
+class InvertedIndexSearchBackend(BaseSearchBackend):
+    """Weighted inverted index stored in the SearchTerm table."""
+
+    field_weights = {"title": 8, "tags": 4, "author": 2, "body": 1}
+
+    def index_post(self, post):
+        values = super().index_post(post)
+        weights = {}
+        for field, weight in self.field_weights.items():
+            for term in tokenize(values[field]):
+                weights[term] = weights.get(term, 0) + weight
+
+        with transaction.atomic():
+            SearchTerm.objects.filter(post=post).delete()
+            SearchTerm.objects.bulk_create(
+                SearchTerm(post=post, term=term, weight=weight)
+                for term, weight in weights.items()
+            )
+        return values
+
+    def search(self, queryset, query):
+        terms = set(tokenize(query))
+        if not terms:
+            # only stop words or punctuation; still annotated for the ordering
+            return queryset.none().annotate(
+                search_rank=Value(0.0, output_field=FloatField())
+            )
+        # every term must match (AND); rank is the sum of term weights
+        return (
+            queryset.filter(search_terms__term__in=terms)
+            .annotate(
+                search_rank=Sum("search_terms__weight", output_field=FloatField()),
+                matched_terms=Count("search_terms"),
+            )
+            .filter(matched_terms=len(terms))
+            .order_by("-search_rank", "-publish", "-id")
+        )
+
+
+class PostgresSearchBackend(BaseSearchBackend):
+    """tsvector/GIN search for PostgreSQL deployments."""
+
+    config = "english"
+
+    def setup(self):
+        table = SearchDocument._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                ALTER TABLE {table} ADD COLUMN IF NOT EXISTS search_vector tsvector
+                GENERATED ALWAYS AS (
+                    setweight(to_tsvector('{self.config}', coalesce(title, '')), 'A')
+                    || setweight(to_tsvector('{self.config}', coalesce(tags, '')), 'B')
+                    || setweight(to_tsvector('simple', coalesce(author, '')), 'C')
+                    || setweight(to_tsvector('{self.config}', coalesce(body, '')), 'D')
+                ) STORED
+                """
+            )
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS {table}_search_vector_gin "
+                f"ON {table} USING gin (search_vector)"
+            )
+
+    def search(self, queryset, query):
+        table = SearchDocument._meta.db_table
+        tsquery = f"websearch_to_tsquery('{self.config}', %s)"
+        matches = RawSQL(
+            f"SELECT post_id FROM {table} WHERE search_vector @@ {tsquery}",
+            (query,),
+        )
+        rank = RawSQL(
+            # cast to float8 so the rank survives a round trip through a cursor
+            f"SELECT ts_rank_cd(search_vector, {tsquery})::float8 FROM {table} "
+            f"WHERE post_id = {Post._meta.db_table}.id",
+            (query,),
+            output_field=FloatField(),
+        )
+        return (
+            queryset.filter(pk__in=matches)
+            .annotate(search_rank=rank)
+            .order_by("-search_rank", "-publish", "-id")
+        )
+
+
+@lru_cache(maxsize=None)
+def get_search_backend():
+    """Return the configured search backend instance."""
+    return import_string(settings.SEARCH_BACKEND)()
+
+
+def reindex_author(user_id):
+    """Background job refreshing the posts of an author whose name changed."""
+    user = get_user_model().objects.filter(pk=user_id).first()
+    if user is not None:
+        get_search_backend().index_author(user)
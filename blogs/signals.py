@@ -0,0 +1,264 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_migrate,
+    post_save,
+    pre_delete,
+)
+from django.dispatch import receiver
+from django.utils import timezone
+from taggit.models import Tag
+
+from config.db import adjust_counter
+from config.tasks import enqueue
+
+from .dashboard import invalidate_dashboard_stats, invalidate_dashboard_stats_of_posts
+from .feeds import invalidate_feeds
+from .images import delete_thumbnail_variants, process_post_thumbnail
+from .models import Comment, Post
+from .search import get_search_backend, reindex_author
+from .sitemaps import invalidate_author_sitemap_pages, invalidate_post_sitemap_page
+from .tag_index import adjust_tag_counts
+from .timeline import fan_out_post, remove_post_from_timelines
+
+PostLike = Post.likes.through
+
+
+@receiver(m2m_changed, sender=PostLike)
+def update_likes_count(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Keep Post.likes_count in sync with the likes relation.
+    `reverse` is True when the change is made from the user side
+    (user.post_likes.add(post)), in which case pk_set holds post ids.
+    """
+    if reverse:
+        lookup = {"customuser_id": instance.pk}
+        pk_field = "post_id"
+    else:
+        lookup = {"post_id": instance.pk}
+        pk_field = "customuser_id"
+
+    if action in ("pre_remove", "pre_clear"):
+        # Django reports the requested ids on remove, not the removed ones,
+        # so capture the rows that actually exist before they are deleted.
+        existing = sender.objects.filter(**lookup)
+        if action == "pre_remove":
+            existing = existing.filter(**{f"{pk_field}__in": pk_set})
+        instance._removed_like_ids = set(existing.values_list(pk_field, flat=True))
+        return
+
+    if action == "post_add":
+        # pk_set only contains the ids that were actually inserted
+        changed, delta = pk_set, 1
+    elif action in ("post_remove", "post_clear"):
+        changed, delta = instance.__dict__.pop("_removed_like_ids", set()), -1
+    else:
+        return
+
+    if not changed:
+        return
+    if reverse:
+        adjust_counter(Post.objects.filter(pk__in=changed), "likes_count", delta)
+        invalidate_dashboard_stats_of_posts(changed)
+    else:
+        adjust_counter(
+            Post.objects.filter(pk=instance.pk), "likes_count", delta * len(changed)
+        )
+        invalidate_dashboard_stats(instance.author_id)
+
+
+@receiver(post_save, sender=Comment)
+def update_comments_count_on_save(sender, instance, created, **kwargs):
+    """Count a comment when it is created active or (de)activated."""
+    if created:
+        delta = 1 if instance.active else 0
+    else:
+        was_active = instance.get_loaded_value("active")
+        if was_active is None or was_active == instance.active:
+            delta = 0
+        else:
+            delta = 1 if instance.active else -1
+    if delta:
+        adjust_counter(
+            Post.objects.filter(pk=instance.post_id), "comments_count", delta
+        )
+        invalidate_dashboard_stats_of_posts([instance.post_id])
+
+
+@receiver(post_delete, sender=Comment)
+def update_comments_count_on_delete(sender, instance, **kwargs):
+    if instance.active:
+        adjust_counter(Post.objects.filter(pk=instance.post_id), "comments_count", -1)
+        invalidate_dashboard_stats_of_posts([instance.post_id])
+
+
+@receiver(post_save, sender=Post)
+def index_post_on_save(sender, instance, raw=False, **kwargs):
+    if not raw:
+        transaction.on_commit(lambda: get_search_backend().index_post(instance))
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def index_post_on_tags_change(sender, instance, action, **kwargs):
+    if isinstance(instance, Post) and action in (
+        "post_add",
+        "post_remove",
+        "post_clear",
+    ):
+        transaction.on_commit(lambda: get_search_backend().index_post(instance))
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def touch_post_on_tags_change(sender, instance, action, **kwargs):
+    """
+    Bump `updated` so cached post cards showing the tags are refreshed, and
+    drop the cached feeds, which list the tags and are not invalidated by
+    this queryset update.
+    """
+    if isinstance(instance, Post) and action in (
+        "post_add",
+        "post_remove",
+        "post_clear",
+    ):
+        Post.objects.filter(pk=instance.pk).update(updated=timezone.now())
+        if instance.status == Post.Status.PUBLISHED:
+            invalidate_feeds()
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def index_author_on_save(sender, instance, raw=False, **kwargs):
+    # the indexed author text is the displayed name, see search.get_author_text()
+    if not raw and instance.display_name_changed():
+        enqueue(reindex_author, instance.pk)
+
+
+@receiver(post_migrate)
+def setup_search_backend(sender, **kwargs):
+    if sender.name == "blogs":
+        get_search_backend().setup()
+
+
+def adjust_tag_counts_on_commit(tag_ids, delta):
+    slugs = list(Tag.objects.filter(pk__in=tag_ids).values_list("slug", flat=True))
+    if slugs:
+        transaction.on_commit(lambda: adjust_tag_counts(slugs, delta))
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def update_tag_index_on_tags_change(sender, instance, action, pk_set, **kwargs):
+    if not isinstance(instance, Post) or instance.status != Post.Status.PUBLISHED:
+        return
+    if action == "pre_clear":
+        # post_clear doesn't say which tags were removed
+        instance._cleared_tag_ids = set(instance.tags.values_list("pk", flat=True))
+    elif action == "post_clear":
+        adjust_tag_counts_on_commit(instance.__dict__.pop("_cleared_tag_ids", ()), -1)
+    elif action in ("post_add", "post_remove"):
+        adjust_tag_counts_on_commit(pk_set, 1 if action == "post_add" else -1)
+
+
+@receiver(post_save, sender=Post)
+def update_tag_index_on_status_change(sender, instance, created, **kwargs):
+    was_published = instance.get_loaded_value("status") == Post.Status.PUBLISHED
+    is_published = instance.status == Post.Status.PUBLISHED
+    # a new post has no tags yet, they are added afterwards
+    if not created and was_published != is_published:
+        tag_ids = instance.tags.values_list("pk", flat=True)
+        adjust_tag_counts_on_commit(tag_ids, 1 if is_published else -1)
+
+
+@receiver(pre_delete, sender=Post)
+def update_tag_index_on_delete(sender, instance, **kwargs):
+    # before the tagged items are deleted along with the post
+    if instance.status == Post.Status.PUBLISHED:
+        adjust_tag_counts_on_commit(instance.tags.values_list("pk", flat=True), -1)
+
+
+@receiver(post_save, sender=Post)
+def queue_thumbnail_processing(sender, instance, raw=False, **kwargs):
+    """Generate the thumbnail variants in the background when it changes."""
+    if raw or instance.thumbnail.name == instance.get_loaded_value("thumbnail"):
+        return
+    if instance.thumbnail:
+        enqueue(process_post_thumbnail, instance.pk, instance.thumbnail.name)
+    elif instance.thumbnail_variants:
+        delete_thumbnail_variants(instance.thumbnail_variants)
+        Post.objects.filter(pk=instance.pk).update(
+            thumbnail_variants=[], thumbnail_placeholder=""
+        )
+
+
+@receiver(post_delete, sender=Post)
+def delete_thumbnail_variants_on_delete(sender, instance, **kwargs):
+    delete_thumbnail_variants(instance.thumbnail_variants)
+
+
+@receiver(post_save, sender=Post)
+def invalidate_feeds_on_save(sender, instance, **kwargs):
+    was_published = instance.get_loaded_value("status") == Post.Status.PUBLISHED
+    if was_published or instance.status == Post.Status.PUBLISHED:
+        invalidate_feeds()
+
+
+@receiver(post_delete, sender=Post)
+def invalidate_feeds_on_delete(sender, instance, **kwargs):
+    if instance.status == Post.Status.PUBLISHED:
+        invalidate_feeds()
+
+
+@receiver(post_save, sender=Post)
+def invalidate_sitemap_on_save(sender, instance, **kwargs):
+    was_published = instance.get_loaded_value("status") == Post.Status.PUBLISHED
+    if was_published or instance.status == Post.Status.PUBLISHED:
+        invalidate_post_sitemap_page(instance)
+
+
+@receiver(post_delete, sender=Post)
+def invalidate_sitemap_on_delete(sender, instance, **kwargs):
+    if instance.status == Post.Status.PUBLISHED:
+        invalidate_post_sitemap_page(instance)
+
+
+@receiver(post_save, sender=Post)
+def update_timelines_on_status_change(sender, instance, raw=False, **kwargs):
+    """Fan a newly published post out to followers, or take it back."""
+    if raw:
+        return
+    was_published = instance.get_loaded_value("status") == Post.Status.PUBLISHED
+    is_published = instance.status == Post.Status.PUBLISHED
+    if is_published and not was_published:
+        enqueue(fan_out_post, instance.pk)
+    elif was_published and not is_published:
+        remove_post_from_timelines(instance.pk)
+
+
+@receiver(post_save, sender=Post)
+def invalidate_dashboard_stats_on_save(sender, instance, created, **kwargs):
+    if created or instance.get_loaded_value("status") != instance.status:
+        invalidate_dashboard_stats(instance.author_id)
+
+
+@receiver(post_delete, sender=Post)
+def invalidate_dashboard_stats_on_delete(sender, instance, **kwargs):
+    invalidate_dashboard_stats(instance.author_id)
+
+
+def username_changed(user):
+    loaded = user.get_loaded_value("username")
+    return loaded is not None and loaded != user.username
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def invalidate_feeds_on_username_change(sender, instance, raw=False, **kwargs):
+    # feed items link to the posts by URL
+    if not raw and username_changed(instance):
+        invalidate_feeds()
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def invalidate_sitemap_on_username_change(sender, instance, raw=False, **kwargs):
+    # the username is part of every post URL
+    if not raw and username_changed(instance):
+        invalidate_author_sitemap_pages(instance.pk)
@@ -1,14 +1,135 @@
+from math import ceil
+
+from django.conf import settings
 from django.contrib.sitemaps import Sitemap
+from django.contrib.sitemaps import views as sitemap_views
+from django.core.cache import cache
+from django.core.paginator import EmptyPage, PageNotAnInteger
+from django.db.models import Max
+from django.http import Http404, HttpResponse
+from django.utils.functional import cached_property
 
 from .models import Post
 
 
+class PrimaryKeyRangePage:
+    def __init__(self, object_list, number):
+        self.object_list = object_list
+        self.number = number
+
+
+class PrimaryKeyRangePaginator:
+    """
+    Split a queryset into pages covering fixed ranges of primary keys:
+    page N holds the rows with (N - 1) * per_page < pk <= N * per_page.
+    A row always stays on the same page, so a change to one post only
+    affects the page holding it.
+    """
+
+    def __init__(self, queryset, per_page, max_pk):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.num_pages = max(ceil((max_pk or 0) / per_page), 1)
+
+    def page(self, number):
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger("That page number is not an integer")
+        if number < 1 or number > self.num_pages:
+            raise EmptyPage("That page contains no results")
+        start = (number - 1) * self.per_page
+        object_list = self.queryset.filter(
+            pk__gt=start, pk__lte=start + self.per_page
+        ).order_by("pk")
+        return PrimaryKeyRangePage(object_list, number)
+
+
 class PostSitemap(Sitemap):
     changefreq = "weekly"
     priority = 0.9
+    limit = settings.SITEMAP_SECTION_SIZE
 
     def items(self):
-        return Post.published.all()
+        # only what location() and lastmod() need, in one query per section
+        return Post.published.select_related("author").only(
+            "slug", "updated", "author__username"
+        )
 
     def lastmod(self, obj):
         return obj.updated
+
+    @cached_property
+    def stats(self):
+        return Post.published.aggregate(max_pk=Max("pk"), latest=Max("updated"))
+
+    @property
+    def paginator(self):
+        return PrimaryKeyRangePaginator(self.items(), self.limit, self.stats["max_pk"])
+
+    def get_latest_lastmod(self):
+        return self.stats["latest"]
+
+    @classmethod
+    def get_page_number(cls, pk):
+        return (pk - 1) // cls.limit + 1
+
+
+def get_section_version_key(section, page):
+    return f"sitemap:version:{section}:{page}"
+
+
+def bump_section_version(section, page):
+    key = get_section_version_key(section, page)
+    cache.add(key, 1, None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, None)
+
+
+def invalidate_post_sitemap_page(post):
+    """Drop the cached sitemap section holding `post`."""
+    bump_section_version("posts", PostSitemap.get_page_number(post.pk))
+
+
+def invalidate_author_sitemap_pages(user_id):
+    """Drop the cached sitemap sections holding the posts of an author."""
+    pks = Post.published.filter(author_id=user_id).values_list("pk", flat=True)
+    for page in {PostSitemap.get_page_number(pk) for pk in pks}:
+        bump_section_version("posts", page)
+
+
+def cached_sitemap(request, sitemaps, section, **kwargs):
+    """
+    django.contrib.sitemaps.views.sitemap with each rendered section page
+    cached until a post in its primary key range changes.
+    """
+    try:
+        # "01" and "1" are the same page, so they must share a cache entry
+        page = int(request.GET.get("p", 1))
+    except ValueError:
+        raise Http404(f"No page '{request.GET['p']}'")
+    version = cache.get(get_section_version_key(section, page), 1)
+    key = f"sitemap:{section}:{page}:{version}"
+
+    cached = cache.get(key)
+    if cached is None:
+        response = sitemap_views.sitemap(request, sitemaps, section=section, **kwargs)
+        response.render()
+        cached = {
+            "content": response.content,
+            "content_type": response["Content-Type"],
+            "headers": {
+                header: response[header]
+                for header in ("Last-Modified", "X-Robots-Tag")
+                if response.has_header(header)
+            },
+        }
+        cache.set(key, cached, settings.SITEMAP_CACHE_TIMEOUT)
+
+    return HttpResponse(
+        cached["content"],
+        content_type=cached["content_type"],
+        headers=cached["headers"],
+    )
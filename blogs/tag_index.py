@@ -0,0 +1,143 @@
+"""
+Cached index of the tags used by published posts.
+
+Each tag's name and number of published posts is cached under its own
+key, and the most used tags for the sidebar under another, so a tag
+lookup or a sidebar render reads one small value however many tags there
+are. blogs.signals keeps both up to date as published posts are tagged,
+untagged, (un)published or deleted, by adjusting the counts in place
+rather than rebuilding them. A missing tag entry is computed for that tag
+alone.
+
+The top list holds twice TAG_INDEX_TOP_SIZE candidates plus `floor`, an
+upper bound of the count of every tag left out. It is only rebuilt with
+an aggregate query when it expires (TAG_INDEX_TIMEOUT, which also bounds
+any drift from concurrent updates) or when decrements leave a shown tag
+below the floor, where a tag left out could overtake it.
+"""
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.db.models import Count
+from taggit.models import Tag, TaggedItem
+
+from .models import Post
+
+TOP_TAGS_KEY = "blogs:top_tags"
+
+
+def get_tag_key(slug):
+    return f"blogs:tag:{slug}"
+
+
+def get_published_tagged_items():
+    return TaggedItem.objects.filter(
+        content_type=ContentType.objects.get_for_model(Post),
+        object_id__in=Post.published.values("pk"),
+    )
+
+
+def build_tag(slug):
+    """Compute the entry of a single tag from the database."""
+    row = (
+        get_published_tagged_items()
+        .filter(tag__slug=slug)
+        .values("tag__name")
+        .annotate(count=Count("id"))
+        .order_by("tag__name")
+        .first()
+    )
+    name = row["tag__name"] if row else None
+    return {"name": name, "slug": slug, "count": row["count"] if row else 0}
+
+
+def build_top_tags():
+    """Compute the top list candidates and their floor from the database."""
+    size = settings.TAG_INDEX_TOP_SIZE * 2
+    rows = (
+        get_published_tagged_items()
+        .values("tag__name", "tag__slug")
+        .annotate(count=Count("id"))
+        .order_by("-count", "tag__name")[: size + 1]
+    )
+    tags = [
+        {"name": row["tag__name"], "slug": row["tag__slug"], "count": row["count"]}
+        for row in rows
+    ]
+    # the most used tag left out bounds the counts of all the others
+    floor = tags.pop()["count"] if len(tags) > size else 0
+    return {"tags": tags, "floor": floor}
+
+
+def get_tag(slug):
+    """Look up a tag by slug, or None if no published post uses it."""
+    key = get_tag_key(slug)
+    tag = cache.get(key)
+    if tag is None:
+        tag = build_tag(slug)
+        cache.set(key, tag, settings.TAG_INDEX_TIMEOUT)
+    return tag if tag["count"] else None
+
+
+def get_top_tags():
+    """Most used tags, as dicts with name, slug and count."""
+    top = cache.get(TOP_TAGS_KEY)
+    if top is None:
+        top = build_top_tags()
+        cache.set(TOP_TAGS_KEY, top, settings.TAG_INDEX_TIMEOUT)
+    return top["tags"][: settings.TAG_INDEX_TOP_SIZE]
+
+
+def adjust_tag_counts(slugs, delta):
+    """Add `delta` to the counts of the tags `slugs` of a published post."""
+    keys = {slug: get_tag_key(slug) for slug in slugs}
+    cached = cache.get_many(keys.values())
+    tags = {}
+    for slug, key in keys.items():
+        if key in cached:
+            tag = cached[key]
+            tag["count"] = max(tag["count"] + delta, 0)
+            tags[key] = tag
+    # missing entries are computed when they are next looked up
+    cache.set_many(tags, settings.TAG_INDEX_TIMEOUT)
+
+    top = cache.get(TOP_TAGS_KEY)
+    if top is not None:
+        update_top_tags(top, slugs, delta)
+
+
+def update_top_tags(top, slugs, delta):
+    candidates = {tag["slug"]: tag for tag in top["tags"]}
+    for slug in slugs:
+        if slug in candidates:
+            tag = candidates[slug]
+            tag["count"] = max(tag["count"] + delta, 0)
+        elif delta > 0:
+            tag = get_tag(slug)
+            if tag is not None and tag["count"] > top["floor"]:
+                candidates[slug] = tag
+
+    size = settings.TAG_INDEX_TOP_SIZE * 2
+    tags = sorted(
+        (tag for tag in candidates.values() if tag["count"]),
+        key=lambda tag: (-tag["count"], tag["name"]),
+    )
+    floor = max([top["floor"]] + [tag["count"] for tag in tags[size:]])
+    tags = tags[:size]
+    shown = tags[: settings.TAG_INDEX_TOP_SIZE]
+    if floor and (
+        len(shown) < settings.TAG_INDEX_TOP_SIZE or shown[-1]["count"] < floor
+    ):
+        # a tag left out may now belong in the sidebar
+        cache.delete(TOP_TAGS_KEY)
+    else:
+        cache.set(
+            TOP_TAGS_KEY, {"tags": tags, "floor": floor}, settings.TAG_INDEX_TIMEOUT
+        )
+
+
+def invalidate_tag_index():
+    """Drop the whole index, e.g. after bulk changes bypassing the signals."""
+    slugs = Tag.objects.values_list("slug", flat=True)
+    cache.delete_many([TOP_TAGS_KEY] + [get_tag_key(slug) for slug in slugs])
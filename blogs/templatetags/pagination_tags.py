@@ -1,3 +1,5 @@
+from urllib.parse import urlencode
+
 from django import template
 from django.urls import reverse
 
@@ -5,14 +7,26 @@ register = template.Library()
 
 
 @register.simple_tag(takes_context=True)
-def get_next_page_url(context, tag=None, query=None, username=None):
-    page = context["page_obj"].number + 1
-    if tag:
-        return f"{reverse('blogs:tag_list', args=[tag])}?page={page}"
+def get_next_page_url(context, tag=None, query=None, username=None, timeline=False):
+    params = {"cursor": context["page_obj"].next_cursor}
+    if timeline:
+        url = reverse("blogs:timeline")
+    elif tag:
+        url = reverse("blogs:tag_list", args=[tag])
     elif query:
-        return f"{reverse('blogs:search')}?q={query}&page={page}"
+        url = reverse("blogs:search")
+        params = {"q": query, **params}
     elif username:
         user = context["user"]
-        return f"{user.get_absolute_url()}?page={page}"
+        url = user.get_absolute_url()
     else:
-        return f"{reverse('blogs:index')}?page={page}"
+        url = reverse("blogs:index")
+    return f"{url}?{urlencode(params)}"
+
+
+@register.simple_tag(takes_context=True)
+def get_next_page_query(context):
+    """The current query string (filters, sorting), moved to the next page."""
+    params = context["request"].GET.copy()
+    params["cursor"] = context["page_obj"].next_cursor
+    return params.urlencode()
@@ -0,0 +1,49 @@
+from django import template
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import prefetch_related_objects
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+register = template.Library()
+
+
+def get_card_key(post, show_tag):
+    """
+    Cache key of a rendered post card. The version part changes whenever
+    the post (including its tags) or its author's profile is saved.
+    """
+    version = "{}-{}".format(
+        int(post.updated.timestamp() * 1_000_000),
+        int(post.author.profile.updated.timestamp() * 1_000_000),
+    )
+    variant = "tagged" if show_tag else "plain"
+    return f"post_card:{variant}:{post.pk}:{version}"
+
+
+@register.simple_tag
+def get_post_cards(posts, page=None, tag=None):
+    """
+    Return (post, html) pairs for the post cards in `posts`, fetching cached
+    cards with a single multi-get and rendering only the misses.
+    """
+    posts = list(posts)
+    # the profile page and the tag pages don't display the post's tag
+    show_tag = not (page == "profile" or tag)
+    keys = {post.pk: get_card_key(post, show_tag) for post in posts}
+    cards = cache.get_many(keys.values())
+
+    missing = [post for post in posts if keys[post.pk] not in cards]
+    if missing:
+        if show_tag:
+            prefetch_related_objects(missing, "tags")
+        rendered = {
+            keys[post.pk]: render_to_string(
+                "blogs/partials/post_card.html", {"post": post, "show_tag": show_tag}
+            )
+            for post in missing
+        }
+        cache.set_many(rendered, settings.POST_CARD_CACHE_TIMEOUT)
+        cards.update(rendered)
+
+    return [(post, mark_safe(cards[keys[post.pk]])) for post in posts]
@@ -1,3 +1,512 @@
-from django.test import TestCase
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management import call_command
+from django.db import DatabaseError
+from django.db.models import QuerySet
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import Profile
+from config.db import adjust_counter
+from config.middleware import RequestMetrics
+from config.nplusone import assert_no_nplusone
+
+from . import view_counts
+from .models import Comment, Post, TimelineEntry, TrendingPost
+from .pagination import CursorPaginator, InvalidCursor
+from .search import get_search_backend
+from .timeline import TimelinePaginator, rebuild_timeline
+from .trending import get_trending_posts, update_trending
+
+User = get_user_model()
+Follow = Profile.follows.through
+
+
+def create_user(username):
+    return User.objects.create_user(username, email=f"{username}@example.com")
+
+
+def create_post(
+    author, title, status=Post.Status.PUBLISHED, content="<p>Content</p>", **kwargs
+):
+    return Post.objects.create(
+        author=author, title=title, content=content, status=status, **kwargs
+    )
+
+
+@override_settings(SEARCH_BACKEND="blogs.search.InvertedIndexSearchBackend")
+class SearchTests(TestCase):
+    def setUp(self):
+        get_search_backend.cache_clear()
+        self.addCleanup(get_search_backend.cache_clear)
+        author = create_user("alice")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.in_title = create_post(author, "Python performance")
+            self.in_body = create_post(author, "Notes", content="Python, again")
+            self.in_tags = create_post(author, "Tips")
+            self.in_tags.tags.add("python")
+            create_post(author, "Rust performance")
+
+    def search(self, query):
+        return list(get_search_backend().search(Post.published.all(), query))
+
+    def test_ranks_by_field_weight(self):
+        self.assertEqual(
+            self.search("python"), [self.in_title, self.in_tags, self.in_body]
+        )
+
+    def test_all_terms_must_match(self):
+        self.assertEqual(self.search("python performance"), [self.in_title])
+        self.assertEqual(self.search("python missing"), [])
+
+    def test_view_orders_by_relevance(self):
+        response = self.client.get(
+            reverse("blogs:search"), {"q": "Python"}, secure=True
+        )
+        self.assertEqual(
+            list(response.context["posts"]),
+            [self.in_title, self.in_tags, self.in_body],
+        )
+
+    def test_query_without_terms(self):
+        # stop words and punctuation leave no term to search for
+        for query in ("the", "!!"):
+            response = self.client.get(
+                reverse("blogs:search"), {"q": query}, secure=True
+            )
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(list(response.context["posts"]), [])
+
+
+class RequestMetricsTests(TestCase):
+    def test_get_many_counts_each_key_once(self):
+        cache = LocMemCache("metrics-test", {})
+        cache.set_many({"a": 1, "b": 2})
+        metrics = RequestMetrics()
+        metrics.instrument_cache(cache)
+        cache.get_many(["a", "b", "c"])
+        self.assertEqual((metrics.cache_hits, metrics.cache_misses), (2, 1))
+        cache.get("a")
+        cache.get("c")
+        self.assertEqual((metrics.cache_hits, metrics.cache_misses), (3, 2))
+
+
+class SitemapTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.post = create_post(create_user("alice"), "First title")
+
+    def test_page_number_variants_share_the_cache(self):
+        url = reverse("sitemap_section", args=["posts"])
+        response = self.client.get(url, {"p": "01"}, secure=True)
+        self.assertContains(response, "first-title")
+        self.post.title = "Second title"
+        self.post.save()
+        response = self.client.get(url, {"p": "01"}, secure=True)
+        self.assertContains(response, "second-title")
+        self.assertNotContains(response, "first-title")
+
+    def test_invalid_page(self):
+        url = reverse("sitemap_section", args=["posts"])
+        response = self.client.get(url, {"p": "x"}, secure=True)
+        self.assertEqual(response.status_code, 404)
+
+
+class PostLikersTests(TestCase):
+    def test_unknown_or_draft_post(self):
+        draft = create_post(create_user("alice"), "Draft", status=Post.Status.DRAFT)
+        for pk in (draft.pk, draft.pk + 1):
+            response = self.client.get(
+                reverse("blogs:post_likers", args=[pk]), secure=True
+            )
+            self.assertEqual(response.status_code, 404)
+
+
+class FeedTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.post = create_post(create_user("alice"), "Tagged later")
+
+    def test_tag_change_refreshes_feeds(self):
+        create_post(self.post.author, "Other").tags.add("django")
+        url = reverse("tag_feed", args=["django"])
+        self.assertNotContains(self.client.get(url, secure=True), "Tagged later")
+        self.post.tags.add("django")
+        self.assertContains(self.client.get(url, secure=True), "Tagged later")
+
+
+class CursorPaginationTests(TestCase):
+    def scroll(self, paginator, between_pages=None):
+        posts, cursor = [], None
+        while True:
+            page = paginator.page(cursor)
+            posts.extend(page)
+            if not page.has_next():
+                return posts
+            cursor = page.next_cursor
+            if between_pages:
+                between_pages()
+
+    def test_pages_are_stable(self):
+        author = create_user("alice")
+        now = timezone.now()
+        for i in range(9):
+            # posts published at the same time are ordered by id
+            post = create_post(author, f"Post {i}")
+            Post.objects.filter(pk=post.pk).update(
+                publish=now - timedelta(hours=i // 3)
+            )
+        expected = list(Post.published.order_by("-publish", "-id"))
+        published = []
+
+        def publish_and_delete():
+            # newer posts don't shift the following pages, deleted ones are left out
+            published.append(create_post(author, f"New post {len(published)}"))
+            Post.objects.filter(pk=expected[-1].pk).delete()
+
+        paginator = CursorPaginator(Post.published.all(), 2)
+        self.assertEqual(self.scroll(paginator, publish_and_delete), expected[:-1])
+
+    def test_search_results_scroll_in_rank_order(self):
+        author = create_user("alice")
+        with self.captureOnCommitCallbacks(execute=True):
+            for i in range(12):
+                title = f"Python {i}" if i % 2 else f"Notes {i}"
+                create_post(author, title, content="Python")
+        expected = list(get_search_backend().search(Post.published.all(), "python"))
+        posts, params = [], {"q": "python"}
+        while True:
+            response = self.client.get(
+                reverse("blogs:search"), params, secure=True, HTTP_HX_REQUEST="true"
+            )
+            page = response.context["page_obj"]
+            posts.extend(page)
+            if not page.has_next():
+                break
+            params["cursor"] = page.next_cursor
+        self.assertEqual(posts, expected)
+        self.assertEqual(len(set(posts)), 12)
+
+    def test_invalid_cursor_value(self):
+        paginator = CursorPaginator(Post.published.all(), 2)
+        cursor = paginator.encode_cursor(Post(publish="yesterday", id=1))
+        with self.assertRaises(InvalidCursor):
+            paginator.page(cursor)
+
+    def test_invalid_cursor(self):
+        author = create_user("alice")
+        create_post(author, "A post")
+        requests = [
+            (reverse("blogs:index"), {}),
+            (reverse("blogs:search"), {"q": "post"}),
+            (reverse("users:profile", kwargs={"username": "alice"}), {}),
+        ]
+        for url, params in requests:
+            # not base64 JSON, and a cursor of the wrong length
+            for cursor in ("not-a-cursor", "WyJ4Il0"):
+                with self.subTest(url=url, cursor=cursor):
+                    response = self.client.get(
+                        url,
+                        {**params, "cursor": cursor},
+                        secure=True,
+                        HTTP_HX_REQUEST="true",
+                    )
+                    self.assertEqual(response.status_code, 404)
+
+
+@override_settings(TIMELINE_FANOUT_MAX_FOLLOWERS=1)
+class TimelineTests(TestCase):
+    def setUp(self):
+        self.reader = create_user("reader")
+        author, star, other = (create_user(name) for name in ("bob", "star", "eve"))
+        for followed in (author, star):
+            Follow.objects.create(
+                from_profile=self.reader.profile, to_profile=followed.profile
+            )
+        # too many followers to be fanned out on write
+        Profile.objects.filter(user=star).update(followers_count=2)
+
+        start = timezone.now() - timedelta(days=1)
+        for i in range(8):
+            post = create_post((author, star, other)[i % 3], f"Post {i}")
+            # two posts per timestamp, ordered by id
+            Post.objects.filter(pk=post.pk).update(publish=start + timedelta(i // 2))
+        create_post(author, "Draft", status=Post.Status.DRAFT)
+        rebuild_timeline(self.reader.pk)
+        self.expected = list(
+            Post.published.filter(author__in=[author, star]).order_by("-publish", "-id")
+        )
+
+    def test_pages_merge_fanned_out_on_read_posts(self):
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.reader).count(),
+            Post.published.filter(author__username="bob").count(),
+        )
+        paginator = TimelinePaginator(Post.published.all(), 2, self.reader)
+        posts, cursor = [], None
+        while True:
+            with self.assertNumQueries(3):
+                page = paginator.page(cursor)
+            posts.extend(page)
+            if not page.has_next():
+                break
+            cursor = page.next_cursor
+        self.assertEqual(posts, self.expected)
+
+    def test_view(self):
+        self.client.force_login(self.reader)
+        response = self.client.get(reverse("blogs:timeline"), secure=True)
+        self.assertEqual(list(response.context["posts"]), self.expected[:10])
+
+
+class NPlusOneTests(TestCase):
+    """The main pages don't load a relation per post, comment or tag."""
+
+    @classmethod
+    def setUpTestData(cls):
+        authors = [create_user(f"author{i}") for i in range(5)]
+        cls.reader = create_user("reader")
+        for i, author in enumerate(authors):
+            Follow.objects.create(
+                from_profile=cls.reader.profile, to_profile=author.profile
+            )
+            for j in range(2):
+                post = create_post(author, f"Post {i} {j}")
+                post.tags.add(f"tag{i}", "shared")
+                post.likes.add(*authors)
+                for commenter in authors:
+                    Comment.objects.create(post=post, author=commenter, comment="Hi")
+        rebuild_timeline(cls.reader.pk)
+        cls.post = post
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.reader)
+
+    def test_pages(self):
+        urls = [
+            reverse("blogs:index"),
+            reverse("blogs:search") + "?q=post",
+            reverse("blogs:tag_list", args=["shared"]),
+            reverse("blogs:timeline"),
+            reverse("blogs:trending"),
+            self.post.get_absolute_url(),
+            reverse("blogs:post_comments", args=[self.post.pk]),
+            reverse("blogs:post_likers", args=[self.post.pk]),
+            reverse("users:profile", kwargs={"username": "author4"}),
+        ]
+        for url in urls:
+            with self.subTest(url=url), assert_no_nplusone():
+                self.assertEqual(self.client.get(url, secure=True).status_code, 200)
+
+
+class CounterTests(TestCase):
+    def setUp(self):
+        self.alice, self.bob = create_user("alice"), create_user("bob")
+        self.post = create_post(self.alice, "Counted")
+
+    def get_counts(self):
+        self.post.refresh_from_db()
+        return self.post.likes_count, self.post.comments_count
+
+    def test_likes_count(self):
+        self.post.likes.add(self.alice, self.bob)
+        self.post.likes.add(self.bob)
+        self.bob.post_likes.remove(self.post)
+        self.post.likes.remove(self.bob)
+        self.assertEqual(self.get_counts(), (1, 0))
+        self.post.likes.clear()
+        self.assertEqual(self.get_counts(), (0, 0))
+
+    def test_comments_count(self):
+        comment = Comment.objects.create(post=self.post, author=self.bob, comment="Hi")
+        Comment.objects.create(
+            post=self.post, author=self.bob, comment="Hidden", active=False
+        )
+        self.assertEqual(self.get_counts(), (0, 1))
+        comment.active = False
+        comment.save()
+        comment.save()
+        self.assertEqual(self.get_counts(), (0, 0))
+        comment.active = True
+        comment.save()
+        comment.delete()
+        self.assertEqual(self.get_counts(), (0, 0))
+
+    def test_counters_dont_go_below_zero(self):
+        posts = Post.objects.filter(pk=self.post.pk)
+        adjust_counter(posts, "likes_count", -3)
+        self.assertEqual(self.get_counts(), (0, 0))
+
+    def test_reconcile_counters(self):
+        self.post.likes.add(self.bob)
+        Comment.objects.create(post=self.post, author=self.bob, comment="Hi")
+        other = create_post(self.bob, "Drifted")
+        Post.objects.update(likes_count=7, comments_count=7)
+        call_command("reconcile_counters", batch_size=1, stdout=StringIO())
+        self.assertEqual(self.get_counts(), (1, 1))
+        other.refresh_from_db()
+        self.assertEqual((other.likes_count, other.comments_count), (0, 0))
+
+
+class PostLikeTests(TestCase):
+    def setUp(self):
+        self.reader = create_user("reader")
+        self.post = create_post(create_user("alice"), "Liked")
+        self.client.force_login(self.reader)
+
+    def request(self, action, pk=None):
+        url = reverse(f"blogs:post_{action}", args=[self.post.pk if pk is None else pk])
+        return self.client.post(url, secure=True)
+
+    def test_like_and_unlike_are_idempotent(self):
+        for action, liked, count in [
+            ("like", True, 1),
+            ("like", True, 1),
+            ("unlike", False, 0),
+            ("unlike", False, 0),
+        ]:
+            with self.subTest(action=action):
+                response = self.request(action)
+                self.assertEqual(
+                    response.json(), {"liked": liked, "likes_count": count}
+                )
+                self.assertEqual(self.post.likes.count(), count)
+
+    def test_likes_count_of_several_users(self):
+        self.post.like(create_user("bob"))
+        self.assertEqual(self.request("like").json()["likes_count"], 2)
+        self.assertEqual(self.request("unlike").json()["likes_count"], 1)
+
+    def test_like_returns_whether_it_changed(self):
+        self.assertIs(self.post.like(self.reader), True)
+        self.assertIs(self.post.like(self.reader), False)
+        self.assertIs(self.post.unlike(self.reader), True)
+        self.assertIs(self.post.unlike(self.reader), False)
+
+    def test_unknown_post(self):
+        self.assertEqual(self.request("like", pk=self.post.pk + 1).status_code, 404)
+
+    def test_login_required(self):
+        self.client.logout()
+        self.assertEqual(self.request("like").status_code, 302)
+        self.assertEqual(self.post.likes.count(), 0)
+
+
+@override_settings(POST_VIEW_FLUSH_BATCH_SIZE=2)
+@mock.patch("blogs.view_counts.start_flusher")
+class ViewCountTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        view_counts._pending.clear()
+        self.addCleanup(view_counts._pending.clear)
+        self.author = create_user("alice")
+        self.posts = [create_post(self.author, f"Post {i}") for i in range(5)]
+
+    def get_view_counts(self):
+        return [post.view_count for post in Post.objects.order_by("pk")]
+
+    def test_flush_in_batches(self, start_flusher):
+        for i, post in enumerate(self.posts):
+            view_counts.buffer_view(post.pk, i + 1)
+        with self.assertNumQueries(3):
+            self.assertEqual(view_counts.flush_views(), 5)
+        self.assertEqual(self.get_view_counts(), [1, 2, 3, 4, 5])
+        self.assertEqual(view_counts._pending, {})
+
+    def test_failed_batch_is_kept_for_the_next_flush(self, start_flusher):
+        for post in self.posts:
+            view_counts.buffer_view(post.pk)
+        update = QuerySet.update
+        calls = []
+
+        def fail_second_batch(queryset, **kwargs):
+            calls.append(queryset)
+            if len(calls) == 2:
+                raise DatabaseError
+            return update(queryset, **kwargs)
+
+        with mock.patch.object(
+            QuerySet, "update", autospec=True, side_effect=fail_second_batch
+        ), self.assertLogs("blogs.view_counts", "ERROR"):
+            self.assertEqual(view_counts.flush_views(), 2)
+        self.assertEqual(self.get_view_counts(), [1, 1, 0, 0, 0])
+
+        # views buffered meanwhile add up with the kept ones
+        view_counts.buffer_view(self.posts[2].pk)
+        self.assertEqual(view_counts.flush_views(), 3)
+        self.assertEqual(self.get_view_counts(), [1, 1, 2, 1, 1])
+
+    def test_reader_counted_once(self, start_flusher):
+        url = self.posts[0].get_absolute_url()
+        self.client.get(url, secure=True)
+        self.client.get(url, secure=True)
+        self.client.force_login(self.author)
+        self.client.get(url, secure=True)
+        view_counts.flush_views()
+        self.assertEqual(self.get_view_counts()[0], 1)
+
+
+@override_settings(
+    TRENDING_HALF_LIFE_HOURS=24,
+    TRENDING_MAX_AGE_DAYS=7,
+    TRENDING_WEIGHTS={"likes": 1.0, "comments": 2.0, "views": 0.5},
+)
+class TrendingTests(TestCase):
+    def setUp(self):
+        self.now = timezone.now()
+        self.author = create_user("alice")
+
+    def create_post(self, title, hours_ago, **counters):
+        post = create_post(self.author, title)
+        publish = self.now - timedelta(hours=hours_ago)
+        self.update_post(post, publish=publish, **counters)
+        return post
+
+    def update_post(self, post, **values):
+        Post.objects.filter(pk=post.pk).update(**values)
+
+    def get_score(self, post):
+        return TrendingPost.objects.get(post=post).score
+
+    def test_first_score_is_decayed_by_age(self):
+        post = self.create_post(
+            "Day old", 24, likes_count=2, comments_count=1, view_count=4
+        )
+        self.assertEqual(update_trending(self.now), 1)
+        self.assertAlmostEqual(self.get_score(post), (2 + 2 + 2) * 0.5)
+
+    def test_score_decays_between_runs_and_adds_growth(self):
+        post = self.create_post("Post", 0, likes_count=4)
+        update_trending(self.now)
+        self.assertAlmostEqual(self.get_score(post), 4)
+        update_trending(self.now + timedelta(hours=48))
+        self.assertAlmostEqual(self.get_score(post), 1)
+        # only the likes added since the last run count, undecayed
+        self.update_post(post, likes_count=7)
+        update_trending(self.now + timedelta(hours=72))
+        self.assertAlmostEqual(self.get_score(post), 0.5 + 3)
+
+    def test_recent_activity_ranks_first(self):
+        old = self.create_post("Old", 72, likes_count=10)
+        recent = self.create_post("Recent", 1, likes_count=4)
+        update_trending(self.now)
+        self.assertEqual(get_trending_posts(), [recent, old])
+
+    def test_old_and_unpublished_posts_are_dropped(self):
+        post = self.create_post("Post", 0, likes_count=1)
+        draft = self.create_post("Draft", 0, likes_count=1)
+        update_trending(self.now)
+        Post.objects.filter(pk=draft.pk).update(status=Post.Status.DRAFT)
+        update_trending(self.now + timedelta(days=1))
+        self.assertEqual(
+            list(TrendingPost.objects.values_list("post", flat=True)), [post.pk]
+        )
+        update_trending(self.now + timedelta(days=8))
+        self.assertFalse(TrendingPost.objects.exists())
@@ -0,0 +1,167 @@
+"""
+Materialized "following" timelines.
+
+When a post is published, a background job writes a TimelineEntry for
+each follower of its author (fan-out on write), so reading a timeline is
+a range scan of the (user, -publish, -post) index. Timelines are capped
+at TIMELINE_MAX_LENGTH entries, trimmed with one windowed DELETE per
+batch of followers.
+
+Authors with more than TIMELINE_FANOUT_MAX_FOLLOWERS followers would make
+that write too expensive; their posts are instead merged into each page
+of a reader's timeline with a second query limited to the page size
+(fan-out on read), so reading never writes.
+"""
+
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import F, Q, Window
+from django.db.models.functions import RowNumber
+
+from accounts.models import Profile
+
+from .models import Post, TimelineEntry
+from .pagination import CursorPaginator
+
+Follow = Profile.follows.through
+
+
+def is_fanned_out_on_read(profile):
+    return profile.followers_count > settings.TIMELINE_FANOUT_MAX_FOLLOWERS
+
+
+def add_entries(user_ids, posts):
+    """Add `posts` ((pk, publish) pairs) to the timelines of `user_ids`."""
+    entries = [
+        TimelineEntry(user_id=user_id, post_id=post_id, publish=publish)
+        for user_id in user_ids
+        for post_id, publish in posts
+    ]
+    TimelineEntry.objects.bulk_create(entries, ignore_conflicts=True)
+    trim_timelines(user_ids)
+
+
+def trim_timelines(user_ids):
+    """Drop the entries beyond TIMELINE_MAX_LENGTH of the timelines of `user_ids`."""
+    overflow = (
+        TimelineEntry.objects.filter(user_id__in=user_ids)
+        .annotate(
+            position=Window(
+                RowNumber(),
+                partition_by=[F("user_id")],
+                order_by=[F("publish").desc(), F("post_id").desc()],
+            )
+        )
+        .filter(position__gt=settings.TIMELINE_MAX_LENGTH)
+        .values("pk")
+    )
+    TimelineEntry.objects.filter(pk__in=overflow).delete()
+
+
+def get_recent_posts(authors):
+    """(pk, publish) of the latest posts by `authors`, at most a full timeline."""
+    return list(
+        Post.published.filter(author__in=authors)
+        .order_by("-publish", "-id")
+        .values_list("pk", "publish")[: settings.TIMELINE_MAX_LENGTH]
+    )
+
+
+def fan_out_post(post_id):
+    """Write a published post into the timelines of its author's followers."""
+    post = Post.published.select_related("author__profile").filter(pk=post_id).first()
+    if post is None or is_fanned_out_on_read(post.author.profile):
+        return
+
+    follower_ids = (
+        Follow.objects.filter(to_profile_id=post.author.profile.pk)
+        .values_list("from_profile__user_id", flat=True)
+        .iterator(chunk_size=settings.TIMELINE_FANOUT_BATCH_SIZE)
+    )
+    while batch := list(islice(follower_ids, settings.TIMELINE_FANOUT_BATCH_SIZE)):
+        add_entries(batch, [(post.pk, post.publish)])
+
+
+def remove_post_from_timelines(post_id):
+    TimelineEntry.objects.filter(post_id=post_id).delete()
+
+
+def add_author_to_timeline(follower_profile_id, author_profile_id):
+    """Backfill the timeline of a new follower with the author's recent posts."""
+    profiles = Profile.objects.in_bulk([follower_profile_id, author_profile_id])
+    follower = profiles.get(follower_profile_id)
+    author = profiles.get(author_profile_id)
+    if follower is None or author is None or is_fanned_out_on_read(author):
+        return
+    add_entries([follower.user_id], get_recent_posts([author.user_id]))
+
+
+def remove_author_from_timeline(follower_profile_id, author_profile_id):
+    TimelineEntry.objects.filter(
+        user__profile=follower_profile_id, post__author__profile=author_profile_id
+    ).delete()
+
+
+def rebuild_timeline(user_id):
+    """Recreate the timeline of a user from the authors they follow."""
+    TimelineEntry.objects.filter(user_id=user_id).delete()
+    authors = Follow.objects.filter(
+        from_profile__user_id=user_id,
+        to_profile__followers_count__lte=settings.TIMELINE_FANOUT_MAX_FOLLOWERS,
+    ).values("to_profile__user_id")
+    add_entries([user_id], get_recent_posts(authors))
+
+
+def get_timeline_posts(user, queryset, limit, after=None):
+    """
+    The first `limit` posts of the timeline of `user`, newest first, after
+    `after`, the (publish, pk) of the last post already served. `queryset`
+    is the published posts to load, e.g. with select_related().
+    """
+    entries = TimelineEntry.objects.filter(user=user)
+    fanned_out_on_read = queryset.filter(
+        author_id__in=Follow.objects.filter(
+            from_profile__user=user,
+            to_profile__followers_count__gt=settings.TIMELINE_FANOUT_MAX_FOLLOWERS,
+        ).values("to_profile__user_id")
+    )
+    if after is not None:
+        publish, pk = after
+        entries = entries.filter(
+            Q(publish__lt=publish) | Q(publish=publish, post_id__lt=pk)
+        )
+        fanned_out_on_read = fanned_out_on_read.filter(
+            Q(publish__lt=publish) | Q(publish=publish, pk__lt=pk)
+        )
+
+    # a range scan of the (user, -publish, -post) index
+    post_ids = list(
+        entries.order_by("-publish", "-post_id").values_list("post_id", flat=True)[
+            :limit
+        ]
+    )
+    posts = {post.pk: post for post in queryset.filter(pk__in=post_ids)}
+    # an author who just crossed the threshold can be in both
+    for post in fanned_out_on_read.order_by("-publish", "-id")[:limit]:
+        posts.setdefault(post.pk, post)
+    return sorted(
+        posts.values(), key=lambda post: (post.publish, post.pk), reverse=True
+    )[:limit]
+
+
+class TimelinePaginator(CursorPaginator):
+    """Cursor pages of the timeline of `user`, see get_timeline_posts()."""
+
+    def __init__(self, queryset, per_page, user):
+        super().__init__(queryset, per_page, ordering=("-publish", "-id"))
+        self.user = user
+
+    def page(self, cursor=None):
+        after = self.decode_cursor(cursor) if cursor else None
+        posts = get_timeline_posts(self.user, self.queryset, self.per_page + 1, after)
+        return self.build_page(posts)
+
+    async def apage(self, cursor=None):
+        return await sync_to_async(self.page)(cursor)
@@ -0,0 +1,113 @@
+"""
+Precomputed trending posts.
+
+update_trending(), run periodically by the update_trending command, keeps
+a TrendingPost row for every post published in the last
+TRENDING_MAX_AGE_DAYS. Its score is an exponentially decayed sum of the
+likes, comments and views the post received, weighted by
+TRENDING_WEIGHTS: each run multiplies the previous score by
+0.5 ** (hours since the last run / TRENDING_HALF_LIFE_HOURS) and adds the
+growth of the post's counters since then. Likes carry no timestamp, so
+the counter growth between runs is what dates the activity; a post
+scored for the first time has its counts decayed by its age instead.
+
+Reading the ranking is one query ordered by the score index, requests
+never aggregate likes or comments.
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Post, TrendingPost
+
+
+def update_trending(now=None):
+    """Rescore the recent published posts, returning how many were scored."""
+    now = now or timezone.now()
+    cutoff = now - timedelta(days=settings.TRENDING_MAX_AGE_DAYS)
+    half_life = settings.TRENDING_HALF_LIFE_HOURS * 60 * 60
+    weights = settings.TRENDING_WEIGHTS
+
+    # the counters and the previous score of every candidate in one query
+    candidates = Post.published.filter(publish__gte=cutoff).values_list(
+        "pk",
+        "publish",
+        "likes_count",
+        "comments_count",
+        "view_count",
+        "trending__score",
+        "trending__likes_seen",
+        "trending__comments_seen",
+        "trending__views_seen",
+        "trending__scored_at",
+    )
+    entries = []
+    for (
+        pk,
+        publish,
+        likes,
+        comments,
+        views,
+        score,
+        likes_seen,
+        comments_seen,
+        views_seen,
+        scored_at,
+    ) in candidates.iterator():
+        is_new = scored_at is None
+        if is_new:
+            score = likes_seen = comments_seen = views_seen = 0
+            scored_at = publish
+        growth = (
+            weights["likes"] * (likes - likes_seen)
+            + weights["comments"] * (comments - comments_seen)
+            + weights["views"] * (views - views_seen)
+        )
+        decay = 0.5 ** (max((now - scored_at).total_seconds(), 0) / half_life)
+        # the first time, the activity is dated at the publication
+        score = growth * decay if is_new else score * decay + growth
+        entries.append(
+            TrendingPost(
+                post_id=pk,
+                score=max(score, 0),
+                likes_seen=likes,
+                comments_seen=comments,
+                views_seen=views,
+                scored_at=now,
+            )
+        )
+
+    with transaction.atomic():
+        TrendingPost.objects.bulk_create(
+            entries,
+            batch_size=1000,
+            update_conflicts=True,
+            unique_fields=["post"],
+            update_fields=[
+                "score",
+                "likes_seen",
+                "comments_seen",
+                "views_seen",
+                "scored_at",
+            ],
+        )
+        # posts that got too old, were unpublished or deleted
+        TrendingPost.objects.filter(
+            Q(post__publish__lt=cutoff) | ~Q(post__status=Post.Status.PUBLISHED)
+        ).delete()
+    return len(entries)
+
+
+def get_trending_posts(limit=None):
+    """The highest scored published posts, best first."""
+    entries = (
+        TrendingPost.objects.filter(post__status=Post.Status.PUBLISHED)
+        .select_related("post__author__profile")
+        .defer("post__content")
+        .order_by("-score")
+    )
+    return [entry.post for entry in entries[: limit or settings.TRENDING_SIZE]]
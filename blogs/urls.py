@@ -8,6 +8,8 @@ urlpatterns = [
     path("", views.PostListView.as_view(), name="index"),
     path("new/", views.PostCreateView.as_view(), name="post_create"),
     path("search/", views.PostListView.as_view(), name="search"),
+    path("following/", views.TimelineView.as_view(), name="timeline"),
+    path("trending/", views.TrendingView.as_view(), name="trending"),
     path("tag/<slug:tag_slug>/", views.PostListView.as_view(), name="tag_list"),
     path(
         "@<str:username>/<slug:post_slug>/",
@@ -21,6 +23,16 @@ urlpatterns = [
 ]
 
 urlpatterns += [
+    path(
+        "<int:pk>/likes/",
+        views.PostLikersView.as_view(),
+        name="post_likers",
+    ),
+    path(
+        "<int:pk>/comments/",
+        views.PostCommentsView.as_view(),
+        name="post_comments",
+    ),
     path(
         "<slug:post_slug>/comment/<int:pk>/edit/",
         views.CommentUpdateView.as_view(),
@@ -34,5 +46,14 @@ urlpatterns += [
 ]
 
 urlpatterns += [
-    path("<int:pk>/like/", views.PostLikeView.as_view(), name="post_like"),
+    path(
+        "<int:pk>/like/",
+        views.PostLikeView.as_view(action="like"),
+        name="post_like",
+    ),
+    path(
+        "<int:pk>/unlike/",
+        views.PostLikeView.as_view(action="unlike"),
+        name="post_unlike",
+    ),
 ]
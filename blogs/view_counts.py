@@ -0,0 +1,121 @@
+"""
+Buffered, write-behind post view counts.
+
+Counting a view with an UPDATE per request would serialize readers of a
+popular post on its row lock. Instead, record_view() adds the view to an
+in-process buffer and a background thread flushes the buffered deltas
+every POST_VIEW_FLUSH_INTERVAL seconds with one bulk UPDATE per batch of
+posts, so the database sees a constant write load per process whatever
+the traffic. Post.view_count lags behind by at most the flush interval.
+
+A reader is counted once per post every POST_VIEW_DEDUPE_SECONDS,
+identified by their session, or by address and user agent when they have
+none. The marker lives in the cache, so with several worker processes
+CACHE_URL must point at a shared cache (e.g. Redis or Memcached): the
+default local-memory cache is per process, and a reader would be counted
+once by every process serving them.
+"""
+
+import atexit
+import hashlib
+import logging
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, close_old_connections
+from django.db.models import Case, F, IntegerField, Value, When
+
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+_pending = Counter()
+_pending_lock = threading.Lock()
+_flusher = None
+_flusher_lock = threading.Lock()
+
+
+def get_viewer_key(request):
+    viewer = request.session.session_key
+    if viewer is None:
+        address = request.META.get("REMOTE_ADDR", "")
+        agent = request.META.get("HTTP_USER_AGENT", "")
+        viewer = hashlib.md5(f"{address}|{agent}".encode()).hexdigest()
+    return viewer
+
+
+def get_seen_key(post_id, viewer):
+    return f"blogs:post_viewed:{post_id}:{viewer}"
+
+
+def buffer_view(post_id, count=1):
+    with _pending_lock:
+        _pending[post_id] += count
+    start_flusher()
+
+
+async def record_view(request, post):
+    """Count a view of `post`, unless the reader saw it recently."""
+    if request.user.is_authenticated and request.user.pk == post.author_id:
+        return
+    key = get_seen_key(post.pk, get_viewer_key(request))
+    # add() only succeeds for the first view within the window
+    if await cache.aadd(key, 1, settings.POST_VIEW_DEDUPE_SECONDS):
+        buffer_view(post.pk)
+
+
+def flush_views():
+    """Write the buffered view counts to the database, returning the number of posts."""
+    with _pending_lock:
+        pending = dict(_pending)
+        _pending.clear()
+    post_ids = sorted(pending)
+    batch_size = settings.POST_VIEW_FLUSH_BATCH_SIZE
+    for start in range(0, len(post_ids), batch_size):
+        batch = post_ids[start : start + batch_size]
+        increment = Case(
+            *[When(pk=pk, then=Value(pending[pk])) for pk in batch],
+            default=Value(0),
+            output_field=IntegerField(),
+        )
+        try:
+            Post.objects.filter(pk__in=batch).update(
+                view_count=F("view_count") + increment
+            )
+        except DatabaseError:
+            logger.exception("Could not flush the view counts of %d posts", len(batch))
+            # keep the views of this and the later batches for the next flush
+            with _pending_lock:
+                for pk in post_ids[start:]:
+                    _pending[pk] += pending[pk]
+            return start
+    return len(post_ids)
+
+
+def run_flusher():
+    while True:
+        time.sleep(settings.POST_VIEW_FLUSH_INTERVAL)
+        try:
+            flush_views()
+        except Exception:
+            logger.exception("Flushing the post view counts failed")
+        finally:
+            # the flusher thread holds its own database connection
+            close_old_connections()
+
+
+def start_flusher():
+    global _flusher
+    if _flusher is not None:
+        return
+    with _flusher_lock:
+        if _flusher is None:
+            _flusher = threading.Thread(
+                target=run_flusher, name="post-view-flusher", daemon=True
+            )
+            _flusher.start()
+            # don't lose the last interval's views when the worker stops
+            atexit.register(flush_views)
@@ -1,46 +1,93 @@
+import asyncio
+
+from asgiref.sync import sync_to_async
 from django.contrib.auth import get_user_model
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.contrib.messages.views import SuccessMessageMixin
-from django.http import HttpResponseRedirect, JsonResponse
+from django.db.models import Exists, OuterRef
+from django.http import Http404, HttpResponseRedirect, JsonResponse
 from django.shortcuts import get_object_or_404, redirect
 from django.urls import reverse, reverse_lazy
 from django.views.generic.base import TemplateView, View
 from django.views.generic.detail import DetailView, SingleObjectMixin
 from django.views.generic.edit import CreateView, DeleteView, FormView, UpdateView
 from django.views.generic.list import ListView
-from taggit.models import Tag
+
+from accounts.models import Profile
+from config.concurrency import load_user, run_in_thread
 
 from .forms import CommentModelForm, PostModelForm
 from .models import Comment, Post
+from .pagination import CursorPaginationMixin, CursorPaginator
+from .search import get_search_backend
+from .tag_index import get_tag, get_top_tags
+from .timeline import TimelinePaginator
+from .trending import get_trending_posts
+from .view_counts import record_view
 
 User = get_user_model()
 
+# number of trending posts shown to visitors on the home page
+TRENDING_PREVIEW_SIZE = 5
 
-class PostListView(ListView):
+
+class PostListView(CursorPaginationMixin, ListView):
     model = Post
     paginate_by = 10
     context_object_name = "posts"
     template_name = "blogs/index.html"
+    # the sidebar tags and, for visitors, the trending preview, fetched
+    # alongside the page
+    top_tags = None
+    trending_posts = None
 
     def get_queryset(self):
         queryset = (
-            Post.published.select_related("author", "author__profile")
-            .prefetch_related("tags")
-            .all()
+            # tags are prefetched for uncached post cards only, see post_cards
+            Post.published.select_related("author", "author__profile").defer("content")
         )
 
         # filter posts based on tag
         tag = self.kwargs.get("tag_slug")
         if tag:
+            if get_tag(tag) is None:
+                # no published post uses this tag
+                return queryset.none()
             queryset = queryset.filter(tags__slug=tag)
 
         # filter posts based on search params
         query = self.request.GET.get("q")
         if query:
-            queryset = queryset.filter(title__icontains=query)
+            queryset = get_search_backend().search(queryset, query)
 
         return queryset
 
+    async def get(self, request, *args, **kwargs):
+        # the tag and search lookups may query the database
+        self.object_list = await sync_to_async(self.get_queryset)()
+        pagination = self.apaginate_queryset(self.object_list, self.paginate_by)
+        if request.htmx:
+            # the infinite scroll partial doesn't render the sidebar
+            await pagination
+            self.top_tags = None
+        else:
+            user = await load_user(request)
+            awaitables = [pagination, run_in_thread(get_top_tags)]
+            if not user.is_authenticated:
+                # the landing page previews the trending posts
+                awaitables.append(
+                    run_in_thread(get_trending_posts, TRENDING_PREVIEW_SIZE)
+                )
+            _, self.top_tags, *trending = await asyncio.gather(*awaitables)
+            self.trending_posts = trending[0] if trending else None
+        return self.render_to_response(self.get_context_data())
+
+    def get_cursor_ordering(self):
+        if self.request.GET.get("q"):
+            # search results stay ordered by relevance
+            return ("-search_rank", "-publish", "-id")
+        return super().get_cursor_ordering()
+
     def get_template_names(self):
         if self.request.htmx:
             return "blogs/partials/post_list.html"
@@ -48,13 +95,56 @@ class PostListView(ListView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        tags = Tag.objects.all()
-        context["tags"] = tags
+        if self.top_tags is not None:
+            context["tags"] = self.top_tags
+        if self.trending_posts is not None:
+            context["trending_posts"] = self.trending_posts
         context["tag"] = self.kwargs.get("tag_slug")
         context["query"] = self.request.GET.get("q")
         return context
 
 
+class TimelineView(LoginRequiredMixin, CursorPaginationMixin, ListView):
+    """Posts from the authors the user follows, see blogs.timeline."""
+
+    paginate_by = 10
+    context_object_name = "posts"
+    template_name = "blogs/index.html"
+
+    def get_queryset(self):
+        return Post.published.select_related("author__profile").defer("content")
+
+    def get_cursor_paginator(self, queryset, page_size):
+        return TimelinePaginator(queryset, page_size, self.request.user)
+
+    def get_template_names(self):
+        if self.request.htmx:
+            return "blogs/partials/post_list.html"
+        return self.template_name
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        if not self.request.htmx:
+            context["tags"] = get_top_tags()
+        context["timeline"] = True
+        return context
+
+
+class TrendingView(ListView):
+    """The trending posts, precomputed by blogs.trending."""
+
+    context_object_name = "posts"
+    template_name = "blogs/trending.html"
+
+    def get_queryset(self):
+        return get_trending_posts()
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["tags"] = get_top_tags()
+        return context
+
+
 class AboutView(TemplateView):
     template_name = "about.html"
 
@@ -85,18 +175,94 @@ class PostDetaillView(DetailView):
     template_name = "blogs/post_detail.html"
 
     def get_queryset(self):
-        return Post.published.select_related("author__profile")
+        return Post.published.select_related("author__profile").with_liked_by(
+            self.request.user
+        )
+
+    async def aget_object(self):
+        slug = self.kwargs[self.slug_url_kwarg]
+        try:
+            return await self.get_queryset().aget(**{self.slug_field: slug})
+        except Post.DoesNotExist:
+            raise Http404("No post found matching the query")
+
+    async def get(self, request, *args, **kwargs):
+        # with_liked_by() needs the user
+        await load_user(request)
+        self.object = post = await self.aget_object()
+        await record_view(request, post)
+        # only the first page, later pages are loaded by PostCommentsView
+        comments = CursorPaginator(
+            post.get_comments(),
+            PostCommentsView.paginate_by,
+            PostCommentsView.cursor_ordering,
+        )
+        # the counts are columns of the post, its comments and tags are
+        # independent queries and run at the same time
+        self.comments, self.related_tags = await asyncio.gather(
+            comments.apage(), run_in_thread(list, post.tags.all())
+        )
+        return self.render_to_response(self.get_context_data(object=post))
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         post = self.object
-        related_tags = post.tags.all()
         context["form"] = CommentModelForm()
-        context["post_likes"] = post.get_likes()
-        context["likes_count"] = post.get_likes_count()
-        context["comments"] = post.get_comments()
-        context["total_comments"] = post.get_total_comments()
-        context["related_tags"] = related_tags
+        context["likes_count"] = post.likes_count
+        context["comments"] = self.comments
+        context["total_comments"] = post.comments_count
+        context["related_tags"] = self.related_tags
+        return context
+
+
+class PostCommentsView(CursorPaginationMixin, ListView):
+    """A page of a post's comments, loaded by htmx as the reader scrolls."""
+
+    paginate_by = 10
+    cursor_ordering = ("created", "id")
+    template_name = "blogs/partials/post_comments_page.html"
+
+    def get_queryset(self):
+        self.post = get_object_or_404(
+            Post.published.only("slug", "author_id"), pk=self.kwargs["pk"]
+        )
+        return self.post.get_comments()
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["post"] = self.post
+        context["comments"] = context["page_obj"]
+        return context
+
+
+class PostLikersView(CursorPaginationMixin, ListView):
+    """A page of the users who liked a post, most recent first."""
+
+    paginate_by = 20
+    cursor_ordering = ("-id",)
+    template_name = "blogs/partials/post_likers_page.html"
+
+    def get_queryset(self):
+        post = get_object_or_404(Post.published.only("pk"), pk=self.kwargs["pk"])
+        likes = Post.likes.through.objects.filter(post_id=post.pk).select_related(
+            "customuser__profile"
+        )
+        if self.request.user.is_authenticated:
+            follows = Profile.follows.through.objects.filter(
+                from_profile__user=self.request.user,
+                to_profile__user=OuterRef("customuser_id"),
+            )
+            likes = likes.annotate(is_followed=Exists(follows))
+        return likes
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        likers = []
+        for like in context["object_list"]:
+            like.customuser.is_followed = getattr(like, "is_followed", False)
+            likers.append(like.customuser)
+        context["likers"] = likers
+        context["post_id"] = self.kwargs["pk"]
         return context
 
 
@@ -137,16 +303,17 @@ class PostCommentFormView(SingleObjectMixin, FormView):
 
 class PostView(View):
     """
-    View for handling both GET and POST requests for a post.
+    View for handling both GET and POST requests for a post. Reading is
+    async, commenting runs the sync form view on a thread.
     """
 
-    def get(self, request, *args, **kwargs):
+    async def get(self, request, *args, **kwargs):
         view = PostDetaillView.as_view()
-        return view(request, *args, **kwargs)
+        return await view(request, *args, **kwargs)
 
-    def post(self, request, *args, **kwargs):
-        view = PostCommentFormView.as_view()
-        return view(request, *args, **kwargs)
+    async def post(self, request, *args, **kwargs):
+        view = sync_to_async(PostCommentFormView.as_view())
+        return await view(request, *args, **kwargs)
 
 
 class PostUpdateView(
@@ -220,14 +387,20 @@ class CommentDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
 
 
 class PostLikeView(LoginRequiredMixin, View):
+    """
+    Like or unlike a post, depending on `action`. Both endpoints are
+    idempotent: repeating a request leaves the post in the same state.
+    """
+
+    action = "like"
+
     def post(self, request, pk, *args, **kwargs):
-        post = get_object_or_404(Post, id=pk)
-        user = request.user
-        if user in post.get_likes():
-            post.likes.remove(user)
-            liked = False
+        post = get_object_or_404(Post.objects.only("id", "author_id"), id=pk)
+        if self.action == "like":
+            post.like(request.user)
         else:
-            post.likes.add(user)
-            liked = True
-        likes_count = post.get_likes_count()
-        return JsonResponse({"liked": liked, "likes_count": likes_count})
+            post.unlike(request.user)
+        post.refresh_from_db(fields=["likes_count"])
+        return JsonResponse(
+            {"liked": self.action == "like", "likes_count": post.likes_count}
+        )
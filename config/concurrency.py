@@ -0,0 +1,82 @@
+"""
+Helpers for async views.
+
+Django's async ORM runs every query of a request on the request's single
+thread-sensitive thread, so awaiting several querysets with
+asyncio.gather() still runs them one after the other. run_in_thread()
+runs a sync callable on a worker thread with its own database
+connection instead, so independent queries overlap:
+
+    page, tags = await asyncio.gather(
+        paginator.apage(), run_in_thread(get_top_tags)
+    )
+
+The workers are a fixed pool of DB_WORKER_THREADS threads that keep
+their database connections for DB_WORKER_CONN_MAX_AGE seconds, so the
+overlapped queries don't pay a connection each and the number of
+connections stays bounded. Requests keep CONN_MAX_AGE: ASGI runs each
+request on its own thread, which would leak persistent connections.
+
+With DB_WORKER_THREADS = 0, the default under manage.py test, the
+callable runs on the request's thread instead.
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connections
+
+from .middleware import instrument_worker_thread
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.DB_WORKER_THREADS, thread_name_prefix="db-worker"
+        )
+    return _executor
+
+
+def release_connections():
+    """Keep the worker's usable connections open until they get too old."""
+    now = time.monotonic()
+    for connection in connections.all(initialized_only=True):
+        if connection.connection is None:
+            continue
+        # a new connection, its deadline replaces the one set from CONN_MAX_AGE
+        if getattr(connection, "worker_connection", None) is not connection.connection:
+            connection.worker_connection = connection.connection
+            connection.worker_close_at = now + settings.DB_WORKER_CONN_MAX_AGE
+        connection.close_at = connection.worker_close_at
+        connection.close_if_unusable_or_obsolete()
+
+
+def call_in_worker(func, args, kwargs):
+    try:
+        with instrument_worker_thread():
+            return func(*args, **kwargs)
+    finally:
+        release_connections()
+
+
+def run_in_thread(func, *args, **kwargs):
+    """Awaitable running func(*args, **kwargs) on a worker thread."""
+    if not settings.DB_WORKER_THREADS:
+        return sync_to_async(func)(*args, **kwargs)
+    return sync_to_async(
+        call_in_worker, thread_sensitive=False, executor=get_executor()
+    )(func, args, kwargs)
+
+
+async def load_user(request):
+    """
+    Load the lazy request.user off the event loop (Django 4.2 has no
+    request.auser()), so async views and templates can use it.
+    """
+    await sync_to_async(lambda: request.user.is_authenticated)()
+    return request.user
@@ -0,0 +1,37 @@
+"""
+Model and queryset helpers shared by the apps.
+"""
+
+from django.db.models import F
+from django.db.models.functions import Greatest
+
+
+class LoadedValuesMixin:
+    """
+    Remember the field values an instance was loaded or last saved with,
+    so signal receivers can detect which fields changed.
+    """
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def get_loaded_value(self, field_name, default=None):
+        return getattr(self, "_loaded_values", {}).get(field_name, default)
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        deferred = self.get_deferred_fields()
+        self._loaded_values = {
+            field.attname: getattr(self, field.attname)
+            for field in self._meta.concrete_fields
+            if field.attname not in deferred
+        }
+
+
+def adjust_counter(queryset, field, delta):
+    """Atomically add `delta` to a counter column without going below zero."""
+    if delta:
+        queryset.update(**{field: Greatest(F(field) + delta, 0)})
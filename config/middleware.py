@@ -0,0 +1,235 @@
+"""
+Per-request performance instrumentation.
+
+ServerTimingMiddleware measures each request's total time, database query
+count and time, cache hits and misses, and template render time. It
+reports them in a Server-Timing header, and writes a JSON-lines record to
+the "config.slow_requests" logger for requests slower than
+SLOW_REQUEST_THRESHOLD_MS. Everything is measured with execute_wrapper,
+per-thread cache instances and the template response hooks, so nothing
+global is patched and the overhead stays low enough to leave on.
+
+The middleware here is async-capable so an ASGI server can run the whole
+chain, and the async views below it, without a thread per request.
+"""
+
+import json
+import logging
+import time
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.utils import timezone
+from whitenoise import middleware as whitenoise
+
+slow_request_logger = logging.getLogger("config.slow_requests")
+
+MISSING = object()
+
+# the metrics measuring the current request (and any outer measurement)
+_request_metrics = ContextVar("request_metrics", default=())
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.db_queries = 0
+        self.db_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.template_time = 0.0
+        self.template_start = None
+
+    def __call__(self, execute, sql, params, many, context):
+        """Database execute wrapper timing each query."""
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - start
+            self.db_queries += 1
+
+    def instrument_cache(self, cache):
+        """Count hits and misses of `cache`, a per-thread cache instance."""
+        get, get_many = cache.get, cache.get_many
+        # BaseCache.get_many() calls self.get() per key, count those once
+        in_get_many = False
+
+        def counting_get(key, default=None, version=None):
+            if in_get_many:
+                return get(key, default, version=version)
+            value = get(key, MISSING, version=version)
+            if value is MISSING:
+                self.cache_misses += 1
+                return default
+            self.cache_hits += 1
+            return value
+
+        def counting_get_many(keys, version=None):
+            nonlocal in_get_many
+            keys = list(keys)
+            in_get_many = True
+            try:
+                values = get_many(keys, version=version)
+            finally:
+                in_get_many = False
+            self.cache_hits += len(values)
+            self.cache_misses += len(keys) - len(values)
+            return values
+
+        cache.get, cache.get_many = counting_get, counting_get_many
+        return cache
+
+    def get_server_timing(self, total):
+        return ", ".join(
+            [
+                f"total;dur={total * 1000:.1f}",
+                f'db;dur={self.db_time * 1000:.1f};desc="{self.db_queries} queries"',
+                f'cache;desc="{self.cache_hits} hits, {self.cache_misses} misses"',
+                f"tpl;dur={self.template_time * 1000:.1f}",
+            ]
+        )
+
+
+def restore_cache(cache):
+    # drop the instance attributes, falling back to the class methods
+    del cache.get, cache.get_many
+
+
+def instrument_thread(metrics, instrument_caches=True):
+    """Measure the queries and cache calls of the current thread with `metrics`."""
+    stack = ExitStack()
+    for connection in connections.all():
+        stack.enter_context(connection.execute_wrapper(metrics))
+    if instrument_caches:
+        for cache in caches.all():
+            metrics.instrument_cache(cache)
+            stack.callback(restore_cache, cache)
+    return stack
+
+
+def instrument_worker_thread():
+    """
+    Measure the queries of a worker thread (see config.concurrency) with the
+    metrics of the request it works for, if any.
+    """
+    stack = ExitStack()
+    for metrics in _request_metrics.get():
+        # cache instances are shared with the request through its context
+        stack.enter_context(instrument_thread(metrics, instrument_caches=False))
+    return stack
+
+
+@contextmanager
+def measure(metrics, instrument_caches=True):
+    """
+    Measure the current thread, and the worker threads it hands queries to,
+    with `metrics`. Cache instrumentation doesn't nest, leave it to the
+    innermost measurement.
+    """
+    token = _request_metrics.set(_request_metrics.get() + (metrics,))
+    try:
+        with instrument_thread(metrics, instrument_caches):
+            yield metrics
+    finally:
+        _request_metrics.reset(token)
+
+
+class ServerTimingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.SERVER_TIMING_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        metrics = request._metrics = RequestMetrics()
+        with measure(metrics):
+            response = self.get_response(request)
+        return self.finish(request, response, metrics)
+
+    async def __acall__(self, request):
+        metrics = request._metrics = RequestMetrics()
+        token = _request_metrics.set(_request_metrics.get() + (metrics,))
+        # the async ORM, template rendering and sync middleware of a request
+        # all run on its thread-sensitive thread, instrument that one
+        stack = await sync_to_async(instrument_thread)(metrics)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+            _request_metrics.reset(token)
+        return self.finish(request, response, metrics)
+
+    def finish(self, request, response, metrics):
+        total = time.perf_counter() - metrics.start
+        response["Server-Timing"] = metrics.get_server_timing(total)
+        if total * 1000 >= settings.SLOW_REQUEST_THRESHOLD_MS:
+            self.log_slow_request(request, response, metrics, total)
+        return response
+
+    def process_template_response(self, request, response):
+        # called right before the response is rendered
+        metrics = request._metrics
+        metrics.template_start = time.perf_counter()
+        response.add_post_render_callback(
+            lambda response: self.end_template_render(metrics)
+        )
+        return response
+
+    def end_template_render(self, metrics):
+        metrics.template_time += time.perf_counter() - metrics.template_start
+
+    def log_slow_request(self, request, response, metrics, total):
+        match = request.resolver_match
+        record = {
+            "time": timezone.now().isoformat(),
+            "method": request.method,
+            "path": request.path,
+            "url_name": match.view_name if match else None,
+            "status": response.status_code,
+            "total_ms": round(total * 1000, 1),
+            "db_queries": metrics.db_queries,
+            "db_ms": round(metrics.db_time * 1000, 1),
+            "cache_hits": metrics.cache_hits,
+            "cache_misses": metrics.cache_misses,
+            "template_ms": round(metrics.template_time * 1000, 1),
+        }
+        slow_request_logger.info(json.dumps(record))
+
+
+class WhiteNoiseMiddleware(whitenoise.WhiteNoiseMiddleware):
+    """WhiteNoise, without falling back to a thread in an async chain."""
+
+    async_capable = True
+
+    def __init__(self, get_response=None, settings=settings):
+        super().__init__(get_response, settings=settings)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            # opens and stats the file
+            return await sync_to_async(self.serve)(static_file, request)
+        return await self.get_response(request)
@@ -0,0 +1,150 @@
+"""
+Development-mode N+1 query detector.
+
+Every query run while handling a request is reduced to its shape (the SQL
+with placeholders, IN lists collapsed) and grouped with the template line,
+or failing that the project code line, that issued it. A shape repeated
+more than NPLUSONE_THRESHOLD times from the same place is almost always a
+relation accessed in a loop. NPlusOneMiddleware logs those, or raises
+NPlusOneError when NPLUSONE_STRICT is set so the test suite fails.
+
+Enable it with NPLUSONE_ENABLED, or wrap code in assert_no_nplusone() in
+tests. Both settings default to on under manage.py test, so a request made
+by a test fails on an N+1.
+"""
+
+import logging
+import re
+import sys
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.template.base import Node
+
+logger = logging.getLogger(__name__)
+
+IN_LIST_RE = re.compile(r"\bIN\s*\((?:\s*%s\s*,?)+\)", re.IGNORECASE)
+LITERAL_RE = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+WHITESPACE_RE = re.compile(r"\s+")
+
+
+class NPlusOneError(Exception):
+    pass
+
+
+def fingerprint(sql):
+    """Reduce a SQL statement to its shape, ignoring parameter values."""
+    sql = LITERAL_RE.sub("%s", sql)
+    sql = IN_LIST_RE.sub("IN (...)", sql)
+    return WHITESPACE_RE.sub(" ", sql).strip()
+
+
+def get_query_origin():
+    """
+    Return (template line, code line) for the query being executed: the
+    innermost template node being rendered and the innermost frame in
+    project code, either of which may be None.
+    """
+    base_dir = str(settings.BASE_DIR)
+    ignored = {__file__, str(settings.BASE_DIR / "manage.py")}
+    template_line = code_line = None
+    frame = start = sys._getframe(2)
+    # skip the other execute wrappers, e.g. the request metrics, around this one
+    while frame is not None and frame.f_code.co_name != "_execute_with_wrappers":
+        frame = frame.f_back
+    frame = frame or start
+    while frame is not None and not (template_line and code_line):
+        filename = frame.f_code.co_filename
+        if template_line is None and frame.f_code.co_name == "render_annotated":
+            node = frame.f_locals.get("self")
+            if isinstance(node, Node) and node.origin and node.token:
+                name = node.origin.template_name or node.origin.name
+                template_line = f"{name}:{node.token.lineno}"
+        if (
+            code_line is None
+            and filename.startswith(base_dir)
+            and "site-packages" not in filename
+            and filename not in ignored
+        ):
+            path = Path(filename).relative_to(base_dir)
+            code_line = f"{path}:{frame.f_lineno} in {frame.f_code.co_name}"
+        frame = frame.f_back
+    return template_line, code_line
+
+
+class QueryTracker:
+    """
+    Context manager counting query shapes per origin on every database
+    connection of the current thread.
+    """
+
+    def __init__(self, threshold=None):
+        self.threshold = threshold or settings.NPLUSONE_THRESHOLD
+        self.counts = Counter()
+        self.code_lines = {}
+
+    def __enter__(self):
+        self._stack = ExitStack()
+        for connection in connections.all():
+            self._stack.enter_context(connection.execute_wrapper(self))
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stack.close()
+
+    def __call__(self, execute, sql, params, many, context):
+        template_line, code_line = get_query_origin()
+        key = (fingerprint(sql), template_line or code_line)
+        self.counts[key] += 1
+        self.code_lines.setdefault(key, code_line)
+        return execute(sql, params, many, context)
+
+    def get_repeated(self):
+        """Return [(sql shape, origin, code line, count)] above the threshold."""
+        return [
+            (sql, origin, self.code_lines[sql, origin], count)
+            for (sql, origin), count in self.counts.most_common()
+            if count > self.threshold
+        ]
+
+    def get_report(self, source=""):
+        lines = [f"Repeated queries{f' in {source}' if source else ''}:"]
+        for sql, origin, code_line, count in self.get_repeated():
+            lines.append(f"  {count}x at {origin or 'unknown'}")
+            if code_line and code_line != origin:
+                lines.append(f"    via {code_line}")
+            lines.append(f"    {sql}")
+        return "\n".join(lines)
+
+
+@contextmanager
+def assert_no_nplusone(threshold=None):
+    """Fail with NPlusOneError if the wrapped code repeats a query shape."""
+    with QueryTracker(threshold) as tracker:
+        yield tracker
+    if tracker.get_repeated():
+        raise NPlusOneError(tracker.get_report())
+
+
+class NPlusOneMiddleware:
+    def __init__(self, get_response):
+        if not settings.NPLUSONE_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with QueryTracker() as tracker:
+            response = self.get_response(request)
+
+        if tracker.get_repeated():
+            match = request.resolver_match
+            view = match.view_name if match else "unresolved view"
+            report = tracker.get_report(f"{view} ({request.path})")
+            if settings.NPLUSONE_STRICT:
+                raise NPlusOneError(report)
+            logger.warning(report)
+        return response
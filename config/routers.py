@@ -0,0 +1,175 @@
+"""
+Read replicas with read-your-writes stickiness.
+
+PrimaryReplicaRouter sends writes to the "default" database and, inside
+requests that allow it, reads to one of the DATABASE_REPLICAS aliases,
+configured from DATABASE_REPLICA_URLS. ReplicaRoutingMiddleware decides per request:
+
+* GET/HEAD/OPTIONS requests read from a healthy replica, picked once per
+  request, until something writes; later reads go to the primary so the
+  request sees its own change.
+* Other methods (comments, likes, follows, post edits, ...) only use the
+  primary, and set a cookie pinning the user to the primary for
+  REPLICA_STICKY_SECONDS so they see their change despite replication lag.
+
+Sessions are always read from the primary. Outside requests (management
+commands, background tasks, the shell) everything stays on the primary.
+
+Replicas are health checked with a trivial query at most every
+REPLICA_HEALTH_CHECK_INTERVAL seconds per process; when none is healthy,
+reads fall back to the primary.
+"""
+
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+logger = logging.getLogger(__name__)
+
+STICKY_COOKIE_NAME = "primary_db_until"
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+# a session missing from a lagging replica would log its user out
+PRIMARY_ONLY_APPS = {"sessions"}
+
+_routing = ContextVar("db_routing", default=None)
+
+_health = {}
+_health_lock = threading.Lock()
+
+
+def get_replica_aliases():
+    return settings.DATABASE_REPLICAS
+
+
+def check_replica(alias):
+    """Whether `alias` answers queries and, on PostgreSQL, isn't too far behind."""
+    connection = connections[alias]
+    try:
+        with connection.cursor() as cursor:
+            if connection.vendor == "postgresql":
+                cursor.execute(
+                    "SELECT COALESCE(EXTRACT(EPOCH FROM "
+                    "now() - pg_last_xact_replay_timestamp()), 0)"
+                )
+                (lag,) = cursor.fetchone()
+                return lag <= settings.REPLICA_MAX_LAG_SECONDS
+            cursor.execute("SELECT 1")
+            return True
+    except DatabaseError:
+        logger.warning("Replica %s failed its health check", alias, exc_info=True)
+        connection.close()
+        return False
+
+
+def is_healthy(alias):
+    now = time.monotonic()
+    with _health_lock:
+        healthy, checked = _health.get(alias, (None, None))
+        if (
+            checked is not None
+            and now - checked < settings.REPLICA_HEALTH_CHECK_INTERVAL
+        ):
+            return healthy
+        # concurrent requests keep the old result while this one checks
+        _health[alias] = (healthy is not False, now)
+    healthy = check_replica(alias)
+    with _health_lock:
+        _health[alias] = (healthy, now)
+    return healthy
+
+
+class RoutingState:
+    def __init__(self, use_replica):
+        self.use_replica = use_replica
+        self.replica = None
+
+    def get_replica(self):
+        """The replica reads go to, picked once, or None for the primary."""
+        if self.use_replica and self.replica is None:
+            healthy = [alias for alias in get_replica_aliases() if is_healthy(alias)]
+            self.replica = random.choice(healthy) if healthy else DEFAULT_DB_ALIAS
+        return self.replica if self.use_replica else None
+
+
+@contextmanager
+def use_replicas(enabled=True):
+    """Allow (or forbid) reads from replicas within the block."""
+    token = _routing.set(RoutingState(enabled and bool(get_replica_aliases())))
+    try:
+        yield
+    finally:
+        _routing.reset(token)
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _routing.get()
+        if state is None or model._meta.app_label in PRIMARY_ONLY_APPS:
+            return None
+        return state.get_replica()
+
+    def db_for_write(self, model, **hints):
+        state = _routing.get()
+        if state is not None:
+            # read your own write for the rest of the request
+            state.use_replica = False
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # replicas hold the same data as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return True
+
+
+class ReplicaRoutingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with use_replicas(self.allows_replicas(request)):
+            response = self.get_response(request)
+        return self.process_response(request, response)
+
+    async def __acall__(self, request):
+        # sync_to_async() copies the context, the routing state comes along
+        with use_replicas(self.allows_replicas(request)):
+            response = await self.get_response(request)
+        return self.process_response(request, response)
+
+    def allows_replicas(self, request):
+        return request.method in SAFE_METHODS and not self.is_sticky(request)
+
+    def process_response(self, request, response):
+        if request.method not in SAFE_METHODS:
+            response.set_cookie(
+                STICKY_COOKIE_NAME,
+                str(time.time() + settings.REPLICA_STICKY_SECONDS),
+                max_age=settings.REPLICA_STICKY_SECONDS,
+                secure=settings.SESSION_COOKIE_SECURE,
+                httponly=True,
+                samesite="Lax",
+            )
+        return response
+
+    def is_sticky(self, request):
+        try:
+            return float(request.COOKIES.get(STICKY_COOKIE_NAME, 0)) > time.time()
+        except ValueError:
+            return False
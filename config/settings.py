@@ -1,5 +1,6 @@
 import environ
 import dj_database_url
+import sys
 from pathlib import Path
 
 env = environ.Env()
@@ -17,10 +18,12 @@ SECRET_KEY = env("SECRET_KEY")
 
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = env.bool("DEBUG", default=False)
-print(DEBUG)
 
 ALLOWED_HOSTS = ["127.0.0.1", "localhost", "django-blog-pgu8.onrender.com"]
 
+# running the test suite (manage.py test)
+TESTING = sys.argv[1:2] == ["test"]
+
 
 # Application definition
 
@@ -42,15 +45,17 @@ INSTALLED_APPS = [
     "crispy_bootstrap5",
     "taggit",
     "django_htmx",
-    "debug_toolbar",
     "social_django",
     "tinymce",
     "whitenoise.runserver_nostatic",
 ]
 
 MIDDLEWARE = [
+    "config.middleware.ServerTimingMiddleware",  # outermost, times everything below
     "django.middleware.security.SecurityMiddleware",
-    "whitenoise.middleware.WhiteNoiseMiddleware",  # whitenoise
+    "config.nplusone.NPlusOneMiddleware",  # opt-in and sync only, see NPLUSONE_ENABLED
+    "config.routers.ReplicaRoutingMiddleware",  # before anything reading the db
+    "config.middleware.WhiteNoiseMiddleware",  # whitenoise, async-capable
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -58,9 +63,14 @@ MIDDLEWARE = [
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
     "django_htmx.middleware.HtmxMiddleware",  # django-htmx
-    "debug_toolbar.middleware.DebugToolbarMiddleware",  # debug-toolbar
 ]
 
+if DEBUG:
+    # debug-toolbar resolves host.docker.internal on every request it sees,
+    # so it is only installed in development
+    INSTALLED_APPS.append("debug_toolbar")
+    MIDDLEWARE.append("debug_toolbar.middleware.DebugToolbarMiddleware")
+
 ROOT_URLCONF = "config.urls"
 
 TEMPLATES = [
@@ -96,10 +106,93 @@ WSGI_APPLICATION = "config.wsgi.application"
 # }
 
 
+# health checks only run on reused connections, see DB_WORKER_CONN_MAX_AGE
 DATABASES = {
-    "default": dj_database_url.parse(env("DATABASE_URL")),
+    "default": dj_database_url.parse(env("DATABASE_URL"), conn_health_checks=True),
+}
+
+# read replicas, see config/routers.py
+# e.g. a copy of a SQLite file: DATABASE_REPLICA_URLS=sqlite:////tmp/replica.sqlite3
+DATABASE_REPLICAS = []
+if TESTING:
+    # a second, empty SQLite database for the router tests (config/tests.py),
+    # which enable it with override_settings(DATABASE_REPLICAS=["replica_1"])
+    DATABASES["replica_1"] = {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": BASE_DIR / "replica.sqlite3",
+    }
+else:
+    for number, url in enumerate(env.list("DATABASE_REPLICA_URLS", default=[]), 1):
+        DATABASES[f"replica_{number}"] = dj_database_url.parse(
+            url, conn_health_checks=True
+        )
+        DATABASE_REPLICAS.append(f"replica_{number}")
+
+DATABASE_ROUTERS = ["config.routers.PrimaryReplicaRouter"]
+
+# threads running the independent queries of async views (config/concurrency.py)
+# and seconds they keep their database connections open for the next query;
+# 0 runs them on the request's thread, as tests need: a worker's connection
+# can't see the data of a test's transaction
+DB_WORKER_THREADS = env.int("DB_WORKER_THREADS", default=0 if TESTING else 4)
+DB_WORKER_CONN_MAX_AGE = env.int("DB_WORKER_CONN_MAX_AGE", default=300)
+
+# seconds a user reads from the primary after a write
+REPLICA_STICKY_SECONDS = env.int("REPLICA_STICKY_SECONDS", default=10)
+# seconds between health checks of a replica
+REPLICA_HEALTH_CHECK_INTERVAL = env.int("REPLICA_HEALTH_CHECK_INTERVAL", default=30)
+# replicas lagging more are skipped (PostgreSQL only)
+REPLICA_MAX_LAG_SECONDS = env.int("REPLICA_MAX_LAG_SECONDS", default=30)
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+
+CACHES = {
+    "default": env.cache_url("CACHE_URL", default="locmemcache://"),
 }
 
+# seconds a rendered post card stays cached (keys are versioned)
+POST_CARD_CACHE_TIMEOUT = 60 * 60 * 24
+
+# seconds a rendered feed stays cached (dropped earlier when posts change)
+FEED_CACHE_TIMEOUT = 60 * 60
+
+# number of tags shown in the sidebar and lifetime of the cached tag index
+TAG_INDEX_TOP_SIZE = 30
+TAG_INDEX_TIMEOUT = 60 * 60
+
+# lifetime of the cached author dashboard stats (dropped earlier on change)
+DASHBOARD_STATS_TIMEOUT = 60 * 60 * 24
+
+# a reader counts as one view of a post per this many seconds, across
+# worker processes only if CACHE_URL is a shared cache
+POST_VIEW_DEDUPE_SECONDS = 60 * 30
+
+# seconds between writes of the buffered view counts, and posts per UPDATE
+POST_VIEW_FLUSH_INTERVAL = env.int("POST_VIEW_FLUSH_INTERVAL", default=10)
+POST_VIEW_FLUSH_BATCH_SIZE = 500
+
+# trending posts: half-life of a like/comment/view, age limit of the posts
+# ranked, weight of each signal and number of posts listed
+TRENDING_HALF_LIFE_HOURS = 24
+TRENDING_MAX_AGE_DAYS = 30
+TRENDING_WEIGHTS = {"likes": 3.0, "comments": 5.0, "views": 0.5}
+TRENDING_SIZE = 50
+
+# background jobs, see config/tasks.py
+BACKGROUND_TASK_WORKERS = env.int("BACKGROUND_TASK_WORKERS", default=2)
+BACKGROUND_TASKS_EAGER = env.bool("BACKGROUND_TASKS_EAGER", default=False)
+
+# number of followed profiles shown in the profile sidebar
+FOLLOWING_PREVIEW_SIZE = 5
+
+# "following" timelines, see blogs/timeline.py
+TIMELINE_MAX_LENGTH = 500
+# authors with more followers are merged into timelines on read
+TIMELINE_FANOUT_MAX_FOLLOWERS = 10000
+TIMELINE_FANOUT_BATCH_SIZE = 1000
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -160,6 +253,9 @@ AUTHENTICATION_BACKENDS = (
 
 # Sitemap
 SITE_ID = 1
+# posts per sitemap section (a fixed primary key range) and cache lifetime
+SITEMAP_SECTION_SIZE = 5000
+SITEMAP_CACHE_TIMEOUT = 60 * 60 * 24
 
 # social auth configs for google
 SOCIAL_AUTH_GOOGLE_OAUTH2_KEY = env("SOCIAL_AUTH_GOOGLE_OAUTH2_KEY")
@@ -202,6 +298,45 @@ INTERNAL_IPS = [
     "127.0.0.1",
 ]
 
+# Server-Timing headers and slow request log, see config/middleware.py
+SERVER_TIMING_ENABLED = env.bool("SERVER_TIMING_ENABLED", default=True)
+SLOW_REQUEST_THRESHOLD_MS = env.int("SLOW_REQUEST_THRESHOLD_MS", default=500)
+# JSON-lines file for slow requests, stderr when empty
+SLOW_REQUEST_LOG = env("SLOW_REQUEST_LOG", default="")
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "formatters": {
+        "message": {"format": "%(message)s"},
+    },
+    "handlers": {
+        "slow_requests": {
+            "formatter": "message",
+            **(
+                {"class": "logging.FileHandler", "filename": SLOW_REQUEST_LOG}
+                if SLOW_REQUEST_LOG
+                else {"class": "logging.StreamHandler"}
+            ),
+        },
+    },
+    "loggers": {
+        "config.slow_requests": {
+            "handlers": ["slow_requests"],
+            "level": "INFO",
+            "propagate": False,
+        },
+    },
+}
+
+# N+1 query detector, see config/nplusone.py; on and failing the requests of
+# the test suite by default
+NPLUSONE_ENABLED = env.bool("NPLUSONE_ENABLED", default=TESTING)
+# raise instead of logging
+NPLUSONE_STRICT = env.bool("NPLUSONE_STRICT", default=TESTING)
+# times a query shape may repeat from the same place before it is reported
+NPLUSONE_THRESHOLD = env.int("NPLUSONE_THRESHOLD", default=3)
+
 # tinymce configuration
 TINYMCE_DEFAULT_CONFIG = {
     "cleanup_on_startup": True,
@@ -225,8 +360,14 @@ TINYMCE_DEFAULT_CONFIG = {
     "statusbar": False,
 }
 
+# Search backend used for post search, see blogs/search.py
+# use "blogs.search.PostgresSearchBackend" on PostgreSQL
+SEARCH_BACKEND = env(
+    "SEARCH_BACKEND", default="blogs.search.InvertedIndexSearchBackend"
+)
+
 # whitenoise configuration
 STATICFILES_STORAGE = "whitenoise.storage.CompressedStaticFilesStorage"
 
 CSRF_COOKIE_SECURE = True
-SESSION_COOKIE_SECURE = True
\ No newline at end of file
+SESSION_COOKIE_SECURE = True
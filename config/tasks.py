@@ -0,0 +1,48 @@
+"""
+Minimal in-process background jobs.
+
+Jobs are handed to a thread pool once the current transaction commits,
+so slow work (image processing, fan-out, ...) runs outside the request
+that triggered it. Set BACKGROUND_TASKS_EAGER to run jobs inline, e.g.
+in tests or management commands.
+"""
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.BACKGROUND_TASK_WORKERS,
+            thread_name_prefix="background-task",
+        )
+    return _executor
+
+
+def run_task(func, *args, **kwargs):
+    try:
+        func(*args, **kwargs)
+    except Exception:
+        logger.exception("Background task %s failed", func.__qualname__)
+    finally:
+        # worker threads hold their own database connections
+        close_old_connections()
+
+
+def enqueue(func, *args, **kwargs):
+    """Run func(*args, **kwargs) in the background after the transaction commits."""
+    if settings.BACKGROUND_TASKS_EAGER:
+        transaction.on_commit(lambda: func(*args, **kwargs))
+    else:
+        transaction.on_commit(
+            lambda: get_executor().submit(run_task, func, *args, **kwargs)
+        )
@@ -0,0 +1,135 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.models import Session
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import OperationalError, connections
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+
+from blogs.models import Post
+
+from . import routers
+from .nplusone import NPlusOneError, NPlusOneMiddleware, assert_no_nplusone, fingerprint
+from .routers import STICKY_COOKIE_NAME, ReplicaRoutingMiddleware
+
+
+def read_databases(request):
+    """A view answering with the databases reads went to."""
+    if request.method == "POST":
+        Post.objects.filter(pk=0).update(view_count=0)
+    return HttpResponse(f"{Post.objects.all().db},{Session.objects.all().db}")
+
+
+@override_settings(DATABASE_REPLICAS=["replica_1"])
+class ReplicaRoutingTests(TestCase):
+    databases = {"default", "replica_1"}
+
+    def setUp(self):
+        routers._health.clear()
+        self.factory = RequestFactory()
+        self.middleware = ReplicaRoutingMiddleware(read_databases)
+
+    def test_reads_go_to_the_replica(self):
+        response = self.middleware(self.factory.get("/"))
+        self.assertEqual(response.content, b"replica_1,default")
+        self.assertNotIn(STICKY_COOKIE_NAME, response.cookies)
+
+    def test_writes_go_to_the_primary_and_stick(self):
+        response = self.middleware(self.factory.post("/"))
+        # reads after the write see it
+        self.assertEqual(response.content, b"default,default")
+        self.assertIn(STICKY_COOKIE_NAME, response.cookies)
+
+        self.factory.cookies[STICKY_COOKIE_NAME] = response.cookies[
+            STICKY_COOKIE_NAME
+        ].value
+        response = self.middleware(self.factory.get("/"))
+        self.assertEqual(response.content, b"default,default")
+
+    def test_expired_or_invalid_sticky_cookie(self):
+        for value in ("0", "soon"):
+            self.factory.cookies[STICKY_COOKIE_NAME] = value
+            response = self.middleware(self.factory.get("/"))
+            self.assertEqual(response.content, b"replica_1,default")
+
+    def test_unhealthy_replica_falls_back_to_the_primary(self):
+        replica = connections["replica_1"]
+        with mock.patch.object(replica, "cursor", side_effect=OperationalError):
+            with self.assertLogs("config.routers", "WARNING"):
+                response = self.middleware(self.factory.get("/"))
+        self.assertEqual(response.content, b"default,default")
+
+        # the result is kept until the next check
+        response = self.middleware(self.factory.get("/"))
+        self.assertEqual(response.content, b"default,default")
+        with override_settings(REPLICA_HEALTH_CHECK_INTERVAL=0):
+            response = self.middleware(self.factory.get("/"))
+        self.assertEqual(response.content, b"replica_1,default")
+
+    def test_requests_read_the_replica(self):
+        post = Post.objects.create(
+            author=get_user_model().objects.create_user("alice", email="a@example.com"),
+            title="On the primary",
+            content="Content",
+            status=Post.Status.PUBLISHED,
+        )
+        post_url = post.get_absolute_url()
+        # the replica is a separate, empty database here
+        self.assertEqual(self.client.get(post_url, secure=True).status_code, 404)
+        with override_settings(DATABASE_REPLICAS=[]):
+            self.assertEqual(self.client.get(post_url, secure=True).status_code, 200)
+
+    def test_outside_requests_use_the_primary(self):
+        self.assertEqual(Post.objects.all().db, "default")
+
+
+def read_authors(request):
+    """A view loading the author of each post in a loop."""
+    names = [post.author.username for post in Post.objects.all()]
+    return HttpResponse(",".join(names))
+
+
+class NPlusOneTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for i in range(5):
+            author = get_user_model().objects.create_user(
+                f"author{i}", email=f"author{i}@example.com"
+            )
+            Post.objects.create(author=author, title=f"Post {i}", content="Content")
+
+    def test_fingerprint(self):
+        self.assertEqual(
+            fingerprint(
+                "SELECT * FROM t WHERE a = 12 AND b = 'it''s'  AND c IN (1, 2)"
+            ),
+            "SELECT * FROM t WHERE a = %s AND b = %s AND c IN (...)",
+        )
+
+    def test_repeated_query(self):
+        with self.assertRaisesMessage(NPlusOneError, "5x at config/tests.py"):
+            with assert_no_nplusone():
+                [post.author.username for post in Post.objects.all()]
+
+    def test_joined_query(self):
+        with assert_no_nplusone():
+            [post.author.username for post in Post.objects.select_related("author")]
+
+    @override_settings(NPLUSONE_ENABLED=True, NPLUSONE_STRICT=True)
+    def test_strict_middleware(self):
+        middleware = NPlusOneMiddleware(read_authors)
+        with self.assertRaises(NPlusOneError):
+            middleware(RequestFactory().get("/"))
+
+    @override_settings(NPLUSONE_ENABLED=True, NPLUSONE_STRICT=False)
+    def test_middleware_logs(self):
+        middleware = NPlusOneMiddleware(read_authors)
+        with self.assertLogs("config.nplusone", "WARNING"):
+            response = middleware(RequestFactory().get("/"))
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(NPLUSONE_ENABLED=False)
+    def test_disabled_middleware(self):
+        with self.assertRaises(MiddlewareNotUsed):
+            NPlusOneMiddleware(read_authors)
@@ -1,11 +1,11 @@
 from django.conf import settings
 from django.conf.urls.static import static
 from django.contrib import admin
-from django.contrib.sitemaps.views import sitemap
+from django.contrib.sitemaps.views import index as sitemap_index
 from django.urls import path, include
 
-from blogs.feeds import PostsFeeds, AtomSiteNewsFeed
-from blogs.sitemaps import PostSitemap
+from blogs.feeds import AtomSiteNewsFeed, AuthorPostsFeed, PostsFeeds, TagPostsFeed
+from blogs.sitemaps import PostSitemap, cached_sitemap
 
 sitemaps = {
     "posts": PostSitemap,
@@ -31,7 +31,15 @@ urlpatterns = [
     path("tinymce/", include("tinymce.urls")),
     path("feed/rss", PostsFeeds(), name="post_feed"),
     path("feed/atom", AtomSiteNewsFeed()),
-    path("sitemap.xml", sitemap, context, name="django.contrib.sitemaps.views.sitemap"),
+    path("@<str:username>/feed", AuthorPostsFeed(), name="author_feed"),
+    path("tag/<slug:tag_slug>/feed", TagPostsFeed(), name="tag_feed"),
+    path(
+        "sitemap.xml",
+        sitemap_index,
+        {**context, "sitemap_url_name": "sitemap_section"},
+        name="django.contrib.sitemaps.views.index",
+    ),
+    path("sitemap-<section>.xml", cached_sitemap, context, name="sitemap_section"),
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
 
 handler404 = "blogs.error_handlers.handler404"